@@ -1,7 +1,31 @@
+import hashlib
+import heapq
 import os
-import re
+import shutil
 
-# Episode data
+# Formatted chapters are cached here, one file per transcript hash
+CACHE_DIR = ".book-cache"
+
+# Bump when format_transcript() changes so cached chapters are re-formatted
+FORMATTER_VERSION = 2
+
+# Words that end with '.' without ending the sentence (lowercase, final dot dropped)
+ABBREVIATIONS = {
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'vs', 'v', 'etc', 'approx',
+    'u.s', 'u.k', 'e.g', 'i.e', 'a.m', 'p.m', 'd.c', 'l.a', 'sgt', 'lt', 'det',
+}
+
+# Paragraph size: this many sentences, but never more than this many characters
+SENTENCES_PER_PARAGRAPH = 3
+MAX_PARAGRAPH_CHARS = 1200
+
+# Sentence-ending punctuation; newlines are watched too (a blank line breaks the paragraph)
+TERMINATORS = '.?!'
+SENTENCE_MARKS = TERMINATORS + '\n'
+# May follow the punctuation and still belong to the sentence
+CLOSING_MARKS = '"\')]'
+
+# Episode data - generated from episodes.json by tools/build_site.py, edit it there
 episodes = [
     {"number": 1, "title": "Hacked iPhones, Federal Spies, and a Murder", "runtime": "13:18", "file": "episode-001-transcript.txt"},
     {"number": 2, "title": "75 Days till Digital Quicksand: The Coming Apocalypse", "runtime": "12:52", "file": "episode-002-transcript.txt"},
@@ -15,30 +39,131 @@ episodes = [
     {"number": 10, "title": "DEA, Meth, and Sophia's Justice", "runtime": "25:04", "file": "episode-008-transcript.txt"}
 ]
 
-def format_transcript(text):
-    """Format the continuous text into paragraphs"""
-    # Split on common transition phrases
-    sentences = text.replace('. ', '.\n').split('\n')
-
-    formatted = []
-    current_paragraph = []
-
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if sentence:
-            current_paragraph.append(sentence)
-            # Create paragraph breaks at logical points
-            if len(current_paragraph) >= 3 and sentence.endswith('.'):
-                formatted.append(' '.join(current_paragraph))
-                current_paragraph = []
-
-    if current_paragraph:
-        formatted.append(' '.join(current_paragraph))
-
-    return '\n\n'.join(formatted)
-
-def create_book():
-    book_content = """# UNDERCOVER FALLOUT: THE COMPLETE INVESTIGATION
+def iter_sentences(text, abbreviations=ABBREVIATIONS):
+    """
+    Yield (start, end, paragraph_break) spans of the sentences in text, in
+    one pass. A sentence ends at '.', '?' or '!' (plus closing quotes or
+    brackets) followed by whitespace, unless the word is an abbreviation.
+    paragraph_break is True when a blank line follows the sentence.
+
+    Candidate positions come from str.find on each mark, merged in order,
+    so the text is scanned at memchr speed and Python only looks at the
+    punctuation and newlines themselves.
+    """
+    length = len(text)
+    find = text.find
+    # Only this much text before a '.' can hold an abbreviation (plus an opening quote)
+    longest = max(map(len, abbreviations), default=0) + 2
+    marks = [(find(mark), mark) for mark in SENTENCE_MARKS]
+    marks = [entry for entry in marks if entry[0] != -1]
+    heapq.heapify(marks)
+
+    start = 0
+    while marks:
+        pos, mark = marks[0]
+        # Advance this mark past anything already consumed ('?!', '...', blank lines)
+        next_pos = find(mark, pos + 1 if pos >= start else start)
+        if next_pos == -1:
+            heapq.heappop(marks)
+        else:
+            heapq.heapreplace(marks, (next_pos, mark))
+        if pos < start:
+            continue
+
+        end = pos + 1
+        if mark == '\n':
+            while end < length and text[end] in ' \t\r':
+                end += 1
+            if end < length and text[end] == '\n':
+                yield start, pos, True
+                while end < length and text[end].isspace():
+                    end += 1
+                start = end
+            continue
+
+        while end < length and text[end] in TERMINATORS:
+            end += 1
+        run_end = end
+        while end < length and text[end] in CLOSING_MARKS:
+            end += 1
+        if end < length and not text[end].isspace():
+            # '2.5', 'U.S' or 'x.com' - not followed by whitespace
+            continue
+        if mark == '.' and run_end == pos + 1:
+            # 'Dr.' or 'U.S.' doesn't end the sentence
+            tail = text[max(start, pos - longest):pos].rsplit(None, 1)
+            if tail and tail[-1].lower().lstrip('"\'(') in abbreviations:
+                continue
+        yield start, end, False
+        start = end
+
+    if start < length:
+        yield start, length, False
+
+def clean_paragraph(paragraph):
+    """Trim a paragraph and fold any line breaks inside it into spaces."""
+    paragraph = paragraph.strip()
+    if '\n' in paragraph:
+        paragraph = ' '.join(paragraph.split())
+    return paragraph
+
+def iter_paragraphs(text, abbreviations=ABBREVIATIONS, sentences_per_paragraph=SENTENCES_PER_PARAGRAPH,
+                    max_paragraph_chars=MAX_PARAGRAPH_CHARS):
+    """
+    Yield paragraphs of text as they are found, in one pass.
+
+    A paragraph is sentences_per_paragraph sentences, cut short at a blank
+    line or when adding a sentence would pass max_paragraph_chars. A single
+    sentence longer than that (transcripts with no punctuation at all) is
+    split at the last space before the limit. Only sentence positions are
+    tracked; each paragraph is sliced from text once.
+    """
+    count = 0
+    paragraph_start = paragraph_end = 0
+    for start, end, paragraph_break in iter_sentences(text, abbreviations):
+        # Runaway sentence: emit limit-sized pieces straight from the source text
+        while end - start > max_paragraph_chars:
+            cut = text.rfind(' ', start, start + max_paragraph_chars + 1)
+            if cut <= start:
+                cut = text.find(' ', start + max_paragraph_chars, end)
+                if cut == -1:
+                    break
+            if count:
+                paragraph = clean_paragraph(text[paragraph_start:paragraph_end])
+                if paragraph:
+                    yield paragraph
+                count = 0
+            piece = clean_paragraph(text[start:cut])
+            if piece:
+                yield piece
+            start = cut + 1
+
+        if count and end - paragraph_start > max_paragraph_chars:
+            paragraph = clean_paragraph(text[paragraph_start:paragraph_end])
+            if paragraph:
+                yield paragraph
+            count = 0
+        if not count:
+            paragraph_start = start
+        paragraph_end = end
+        count += 1
+
+        if paragraph_break or count >= sentences_per_paragraph:
+            paragraph = clean_paragraph(text[paragraph_start:paragraph_end])
+            if paragraph:
+                yield paragraph
+            count = 0
+
+    if count:
+        paragraph = clean_paragraph(text[paragraph_start:paragraph_end])
+        if paragraph:
+            yield paragraph
+
+def format_transcript(text, **options):
+    """Format the continuous text into paragraphs (see iter_paragraphs for options)"""
+    return '\n\n'.join(iter_paragraphs(text, **options))
+
+TITLE_PAGE = """# UNDERCOVER FALLOUT: THE COMPLETE INVESTIGATION
 
 ## A Firsthand Account of Murder, Federal Cooperation, and Systemic Failure
 
@@ -50,25 +175,9 @@ def create_book():
 
 **INTRODUCTION: FROM DIGITAL BUNKER TO FEDERAL WITNESS**
 
-**PART I: THE DIGITAL NIGHTMARE**
-- Chapter 1: Hacked iPhones, Federal Spies, and a Murder
-- Chapter 2: 75 Days till Digital Quicksand: The Coming Apocalypse
-- Chapter 3: $75,000, The Doctor, and Systematic Theft
-
-**PART II: THE STREET INVESTIGATION**
-- Chapter 4: Neighborhood Girl Energy, Tear Gas, and MS-13
-- Chapter 5: Protection-Free Zone
-- Chapter 6: Hacking AI While High: Murder
-
-**PART III: THE FEDERAL CONNECTION**
-- Chapter 7: Funerals, Teeth and The 6
-- Chapter 8: Trap Hotel HQ - Where Fun Goes to Die
-- Chapter 9: Wrong Floor Right Door
-- Chapter 10: DEA, Meth, and Sophia's Justice
-
-**EPILOGUE: MAKING THE INVISIBLE VISIBLE**
+"""
 
----
+INTRODUCTION = """---
 
 ## INTRODUCTION: FROM DIGITAL BUNKER TO FEDERAL WITNESS
 
@@ -91,41 +200,7 @@ Welcome to the bunker. This is where truth meets technology, and where one perso
 
 """
 
-    # Add each chapter
-    parts = ["# PART I: THE DIGITAL NIGHTMARE\n\n",
-             "\n---\n\n# PART II: THE STREET INVESTIGATION\n\n",
-             "\n---\n\n# PART III: THE FEDERAL CONNECTION\n\n"]
-
-    part_index = 0
-    for i, episode in enumerate(episodes):
-        if i == 3:
-            book_content += parts[1]
-            part_index = 1
-        elif i == 6:
-            book_content += parts[2]
-            part_index = 2
-        elif i == 0:
-            book_content += parts[0]
-
-        # Add chapter header
-        book_content += f"## Chapter {episode['number']}: {episode['title']}\n"
-        book_content += f"*Runtime: {episode['runtime']}*\n\n"
-
-        # Read transcript file
-        transcript_path = os.path.join("transcripts", episode['file'])
-        if os.path.exists(transcript_path):
-            with open(transcript_path, 'r', encoding='utf-8') as f:
-                raw_text = f.read()
-
-            # Format the text
-            formatted_text = format_transcript(raw_text[:5000])  # First 5000 chars for brevity
-            book_content += formatted_text
-            book_content += "\n\n[Chapter continues with full investigation details...]\n\n---\n\n"
-        else:
-            book_content += f"[Transcript file {episode['file']} not found]\n\n---\n\n"
-
-    # Add epilogue
-    book_content += """## EPILOGUE: MAKING THE INVISIBLE VISIBLE
+EPILOGUE = """## EPILOGUE: MAKING THE INVISIBLE VISIBLE
 
 The investigation continues. Sophia's case remains active. The DEA has the evidence. The network has been exposed.
 
@@ -144,13 +219,97 @@ Remember Sophia. Question everything. Use the tools.
 *For more information and ongoing updates, visit undercoverfallout.com*
 """
 
-    # Write the book
-    with open("UNDERCOVER-FALLOUT-FINAL-BOOK.md", 'w', encoding='utf-8') as f:
-        f.write(book_content)
+# Parts, starting at the chapter at each index
+PARTS = {
+    0: "PART I: THE DIGITAL NIGHTMARE",
+    3: "PART II: THE STREET INVESTIGATION",
+    6: "PART III: THE FEDERAL CONNECTION",
+}
+
+def table_of_contents():
+    """The contents entries for the parts and chapters, from PARTS and episodes."""
+    lines = []
+    for i, episode in enumerate(episodes):
+        if i in PARTS:
+            if lines:
+                lines.append("")
+            lines.append(f"**{PARTS[i]}**")
+        lines.append(f"- Chapter {episode['number']}: {episode['title']}")
+    lines.extend(["", "**EPILOGUE: MAKING THE INVISIBLE VISIBLE**", "", ""])
+    return '\n'.join(lines)
+
+def cached_chapter(transcript_path, used):
+    """
+    Path of the formatted chapter for a transcript in CACHE_DIR, formatting
+    it first if the transcript or the formatter changed.
+
+    Adds the cache file name to `used`. Returns (cache_path, formatted_now).
+    """
+    # One buffered read; the bytes are hashed, and decoded only on a cache miss
+    with open(transcript_path, 'rb') as f:
+        raw = f.read()
+
+    name = f"{hashlib.sha256(raw).hexdigest()}-v{FORMATTER_VERSION}.md"
+    cache_path = os.path.join(CACHE_DIR, name)
+    used.add(name)
+    if os.path.exists(cache_path):
+        return cache_path, False
+
+    # Paragraphs go to the cache file as they are found; the formatted text is never held whole
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for i, paragraph in enumerate(iter_paragraphs(raw.decode('utf-8'))):
+            if i:
+                f.write('\n\n')
+            f.write(paragraph)
+    os.replace(tmp_path, cache_path)
+    return cache_path, True
+
+def create_book(output_file="UNDERCOVER-FALLOUT-FINAL-BOOK.md"):
+    """Stream the book to output_file chapter by chapter, re-formatting only changed transcripts."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    used = set()
+    formatted_count = 0
+
+    with open(output_file, 'w', encoding='utf-8') as book:
+        book.write(TITLE_PAGE)
+        book.write(table_of_contents())
+        book.write(INTRODUCTION)
+
+        # Add each chapter
+        for i, episode in enumerate(episodes):
+            if i in PARTS:
+                if i:
+                    book.write("\n---\n\n")
+                book.write(f"# {PARTS[i]}\n\n")
+
+            # Add chapter header
+            book.write(f"## Chapter {episode['number']}: {episode['title']}\n")
+            book.write(f"*Runtime: {episode['runtime']}*\n\n")
+
+            # Full transcript, copied from the formatted-chapter cache in blocks
+            transcript_path = os.path.join("transcripts", episode['file'])
+            if os.path.exists(transcript_path):
+                cache_path, formatted_now = cached_chapter(transcript_path, used)
+                formatted_count += formatted_now
+                with open(cache_path, 'r', encoding='utf-8') as chapter:
+                    shutil.copyfileobj(chapter, book)
+                book.write("\n\n---\n\n")
+            else:
+                book.write(f"[Transcript file {episode['file']} not found]\n\n---\n\n")
+
+        # Add epilogue
+        book.write(EPILOGUE)
+
+    # Drop cached chapters for transcripts that changed or went away
+    for name in os.listdir(CACHE_DIR):
+        if name not in used:
+            os.remove(os.path.join(CACHE_DIR, name))
 
     print("Book compiled successfully!")
-    print(f"Total length: {len(book_content)} characters")
+    print(f"Total length: {os.path.getsize(output_file)} bytes")
+    print(f"Chapters formatted: {formatted_count} (the rest unchanged, from {CACHE_DIR}/)")
 
 if __name__ == "__main__":
-    os.chdir(r"C:\Users\rober\OneDrive\Desktop\undercover-fallout")
-    create_book()
\ No newline at end of file
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    create_book()
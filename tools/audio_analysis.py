@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+"""
+Decode an episode once and run every audio analysis on the same PCM.
+Usage: python audio_analysis.py <audio_file> [output_file] [--update-manifest]
+
+ffmpeg decodes the file to 48 kHz float PCM (the rate the BS.1770 filters
+are specified at), one second at a time, and each block is handed to every
+consumer in turn:
+
+  loudness    EBU R128 integrated loudness, loudness range and true peak
+              (BS.1770-4 K-weighting and gating, 4x oversampled true peak)
+  silence     the pauses longer than MIN_SILENCE_MS, as [start_ms, end_ms]
+  waveform    WAVEFORM_POINTS peak levels (0-255) for the player's seek bar
+  speech      16 kHz mono 16-bit PCM for the recognizer; pulled by
+              transcribe_audio.py --audio-analysis, so transcribing and
+              analysing an episode share one decode
+
+Consumers work on whole blocks with NumPy (FFT convolution, or matrix
+products over sliding windows of the block), never one sample at a time,
+and carry only the filter history they need from one block to the next.
+
+Results are written as JSON next to the audio (<audio>-analysis.json).
+--update-manifest sets the matching episode's `analysis` in episodes.json
+so the player draws the waveform; run build_site.py afterwards.
+Needs numpy (pip install numpy).
+"""
+
+import argparse
+import json
+import math
+import os
+import struct
+import subprocess
+import sys
+
+try:
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+except ImportError:
+    np = None
+
+from media_common import FFMPEG_BINARY
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFEST_FILE = os.path.join(REPO_ROOT, 'episodes.json')
+
+# Bump when a consumer's output changes meaning
+ANALYSIS_VERSION = 1
+
+# Decoded PCM: float32 at 48 kHz, channels as in the file
+SAMPLE_RATE = 48000
+BLOCK_MS = 1000
+
+# BS.1770-4 K-weighting at 48 kHz as (b, a): high shelf, then the RLB high-pass
+K_WEIGHTING = [
+    ([1.53512485958697, -2.69169618940638, 1.19839281085285], [1.0, -1.69065929318241, 0.73248077421585]),
+    ([1.0, -2.0, 1.0], [1.0, -1.99004745483398, 0.99007225036621]),
+]
+# Length of the K-weighting impulse response applied as an FIR; the rest is below -150 dB
+K_WEIGHTING_TAPS = 4096
+
+# Channel weights by channel count; 5.1 (FL FR FC LFE BL BR) leaves out the LFE
+# and lifts the surrounds 1.5 dB. Anything else weighs every channel equally.
+CHANNEL_WEIGHTS = {6: [1.0, 1.0, 1.0, 0.0, 1.41, 1.41]}
+
+# Gating (BS.1770-4 for integrated loudness, EBU Tech 3342 for loudness range)
+GATE_STEP_MS = 100            # blocks overlap by 75% (400 ms) and 97% (3 s)
+MOMENTARY_MS = 400
+SHORT_TERM_MS = 3000
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+LRA_RELATIVE_GATE_LU = -20.0
+LRA_PERCENTILES = (10, 95)
+
+# True peak: 4x oversampling through a windowed-sinc interpolation filter
+TRUE_PEAK_OVERSAMPLE = 4
+TRUE_PEAK_TAPS = 49
+
+# Speech PCM for the recognizer: 48 kHz -> 16 kHz, low-passed under 8 kHz first
+SPEECH_RATE = 16000
+SPEECH_DECIMATION = SAMPLE_RATE // SPEECH_RATE
+SPEECH_FILTER_TAPS = 95
+SPEECH_CUTOFF_HZ = 7600
+
+# Silence map: 20 ms frames quieter than this for at least MIN_SILENCE_MS
+SILENCE_THRESH_DB = -40.0
+SILENCE_FRAME_MS = 20
+MIN_SILENCE_MS = 1000
+
+# Waveform: peak per 100 ms, reduced to this many points for the player
+WAVEFORM_STEP_MS = 100
+WAVEFORM_POINTS = 1000
+
+
+def lowpass(taps, cutoff, gain=1.0):
+    """Blackman-windowed sinc low-pass; cutoff as a fraction of the sample rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    h = np.sinc(2 * cutoff * n) * np.blackman(taps)
+    return h * (gain / h.sum())
+
+def iir_impulse(stages, length):
+    """Impulse response of cascaded biquads, to apply them block-wise as an FIR."""
+    response = [1.0] + [0.0] * (length - 1)
+    for b, a in stages:
+        x1 = x2 = y1 = y2 = 0.0
+        out = []
+        for x in response:
+            y = b[0] * x + b[1] * x1 + b[2] * x2 - a[1] * y1 - a[2] * y2
+            x2, x1, y2, y1 = x1, x, y1, y
+            out.append(y)
+        response = out
+    return np.array(response)
+
+def lufs(power):
+    return -0.691 + 10 * math.log10(power) if power > 0 else float('-inf')
+
+def decibels(level):
+    return 20 * math.log10(level) if level > 0 else float('-inf')
+
+def finite(value, digits=2):
+    """JSON-safe rounding: -inf (digital silence) becomes None."""
+    return round(value, digits) if math.isfinite(value) else None
+
+
+class OverlapAdd:
+    """Block-wise FIR convolution by FFT, carrying the tail into the next block."""
+
+    def __init__(self, h):
+        self.h = h
+        self.tail = None
+        self.spectra = {}
+
+    def __call__(self, x):
+        taps = len(self.h)
+        if self.tail is None:
+            self.tail = np.zeros((taps - 1, x.shape[1]))
+        size = 1 << (len(x) + taps - 2).bit_length()
+        if size not in self.spectra:
+            self.spectra[size] = np.fft.rfft(self.h, size)[:, None]
+        y = np.fft.irfft(np.fft.rfft(x, size, axis=0) * self.spectra[size], size, axis=0)
+        y = y[:len(x) + taps - 1]
+        y[:taps - 1] += self.tail
+        self.tail = y[len(x):]
+        return y[:len(x)]
+
+
+class StepReducer:
+    """
+    Reduce a sample stream to one value per fixed-length step, keeping the
+    samples of an unfinished step for the next block.
+    """
+
+    def __init__(self, step, reduce):
+        self.step = step
+        self.reduce = reduce
+        self.pending = None
+        self.values = []
+
+    def feed(self, x):
+        if self.pending is not None and len(self.pending):
+            x = np.concatenate([self.pending, x])
+        whole = len(x) // self.step * self.step
+        if whole:
+            self.values.append(self.reduce(x[:whole].reshape(whole // self.step, self.step, *x.shape[1:])))
+        self.pending = x[whole:]
+
+    def result(self):
+        return np.concatenate(self.values) if self.values else np.zeros(0)
+
+
+class LoudnessMeter:
+    """EBU R128 integrated loudness, loudness range, sample and true peak."""
+
+    name = 'loudness'
+
+    def __init__(self):
+        self.kweighting = OverlapAdd(iir_impulse(K_WEIGHTING, K_WEIGHTING_TAPS))
+        self.steps = StepReducer(SAMPLE_RATE * GATE_STEP_MS // 1000, lambda steps: steps.mean(axis=1))
+        self.weights = None
+        self.history = None
+        self.sample_peak = 0.0
+        self.true_peak = 0.0
+
+        # interpolation[t, p]: weight of window sample t for oversampled phase p
+        h = lowpass(TRUE_PEAK_TAPS, 0.5 / TRUE_PEAK_OVERSAMPLE, TRUE_PEAK_OVERSAMPLE)
+        self.window = -(-TRUE_PEAK_TAPS // TRUE_PEAK_OVERSAMPLE)
+        self.interpolation = np.zeros((self.window, TRUE_PEAK_OVERSAMPLE))
+        for t in range(self.window):
+            for p in range(TRUE_PEAK_OVERSAMPLE):
+                k = p + TRUE_PEAK_OVERSAMPLE * (self.window - 1 - t)
+                if k < TRUE_PEAK_TAPS:
+                    self.interpolation[t, p] = h[k]
+
+    def feed(self, samples):
+        channels = samples.shape[1]
+        if self.weights is None:
+            self.weights = np.array(CHANNEL_WEIGHTS.get(channels, [1.0] * channels))
+            self.history = np.zeros((self.window - 1, channels), dtype=samples.dtype)
+
+        weighted = self.kweighting(samples)
+        self.steps.feed((weighted * weighted) @ self.weights)
+
+        self.sample_peak = max(self.sample_peak, float(np.abs(samples).max()))
+        extended = np.concatenate([self.history, samples])
+        for channel in range(channels):
+            windows = sliding_window_view(extended[:, channel], self.window)
+            self.true_peak = max(self.true_peak, float(np.abs(windows @ self.interpolation).max()))
+        self.history = extended[len(samples):]
+
+    def result(self):
+        steps = self.steps.result()
+
+        def blocks(ms):
+            size = ms // GATE_STEP_MS
+            if len(steps) < size:
+                return np.zeros(0)
+            sums = np.cumsum(np.concatenate([[0.0], steps]))
+            return (sums[size:] - sums[:-size]) / size
+
+        def gated(powers, relative_lu):
+            powers = powers[powers > 10 ** ((ABSOLUTE_GATE_LUFS + 0.691) / 10)]
+            if not len(powers):
+                return powers
+            threshold = 10 ** ((lufs(powers.mean()) + relative_lu + 0.691) / 10)
+            return powers[powers > threshold]
+
+        momentary = blocks(MOMENTARY_MS)
+        integrated = gated(momentary, RELATIVE_GATE_LU)
+        short_term = blocks(SHORT_TERM_MS)
+        ranged = gated(short_term, LRA_RELATIVE_GATE_LU)
+        if len(ranged):
+            low, high = np.percentile(-0.691 + 10 * np.log10(ranged), LRA_PERCENTILES)
+            loudness_range = high - low
+        else:
+            loudness_range = 0.0
+
+        return {
+            'integrated_lufs': finite(lufs(integrated.mean()) if len(integrated) else float('-inf'), 1),
+            'loudness_range_lu': round(float(loudness_range), 1),
+            'momentary_max_lufs': finite(lufs(momentary.max()) if len(momentary) else float('-inf'), 1),
+            'short_term_max_lufs': finite(lufs(short_term.max()) if len(short_term) else float('-inf'), 1),
+            'true_peak_dbtp': finite(decibels(max(self.true_peak, self.sample_peak)), 1),
+            'sample_peak_dbfs': finite(decibels(self.sample_peak), 1),
+        }
+
+
+class SilenceMap:
+    """Pauses of at least min_silence_ms, from the RMS of 20 ms mono frames."""
+
+    name = 'silence'
+
+    def __init__(self, silence_thresh_db=SILENCE_THRESH_DB, min_silence_ms=MIN_SILENCE_MS):
+        self.silence_thresh_db = silence_thresh_db
+        threshold = 10 ** (silence_thresh_db / 20)
+        self.frames = StepReducer(SAMPLE_RATE * SILENCE_FRAME_MS // 1000,
+                                  lambda frames: np.sqrt((frames * frames).mean(axis=1)) < threshold)
+        self.min_frames = max(1, min_silence_ms // SILENCE_FRAME_MS)
+
+    def feed(self, samples):
+        self.frames.feed(samples.mean(axis=1))
+
+    def result(self):
+        silent = self.frames.result().astype(np.int8)
+        edges = np.diff(np.concatenate([[0], silent, [0]]))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        keep = ends - starts >= self.min_frames
+        pauses = [[int(start) * SILENCE_FRAME_MS, int(end) * SILENCE_FRAME_MS]
+                  for start, end in zip(starts[keep], ends[keep])]
+        return {
+            'threshold_db': self.silence_thresh_db,
+            'min_silence_ms': self.min_frames * SILENCE_FRAME_MS,
+            'total_seconds': round(sum(end - start for start, end in pauses) / 1000, 2),
+            'pauses': pauses,
+        }
+
+
+class WaveformPeaks:
+    """Peak level per WAVEFORM_STEP_MS, reduced to `points` values scaled 0-255."""
+
+    name = 'waveform'
+
+    def __init__(self, points=WAVEFORM_POINTS):
+        self.points = points
+        self.steps = StepReducer(SAMPLE_RATE * WAVEFORM_STEP_MS // 1000,
+                                 lambda steps: np.abs(steps).max(axis=(1, 2)))
+
+    def feed(self, samples):
+        self.steps.feed(samples)
+
+    def result(self):
+        steps = self.steps.result()
+        if not len(steps):
+            return {'points': 0, 'peaks': []}
+        points = min(self.points, len(steps))
+        starts = np.linspace(0, len(steps), points + 1).astype(int)[:-1]
+        peaks = np.maximum.reduceat(steps, starts)
+        loudest = peaks.max()
+        scaled = np.round(peaks / loudest * 255) if loudest > 0 else np.zeros(points)
+        return {'points': points, 'peaks': scaled.astype(int).tolist()}
+
+
+class SpeechResampler:
+    """48 kHz float blocks -> 16 kHz mono 16-bit PCM, as the recognizer takes it."""
+
+    def __init__(self):
+        self.h = lowpass(SPEECH_FILTER_TAPS, SPEECH_CUTOFF_HZ / SAMPLE_RATE)
+        # Half a filter of leading zeros centres each output on its input sample
+        self.history = np.zeros((SPEECH_FILTER_TAPS - 1) // 2)
+
+    def feed(self, samples):
+        mono = samples.mean(axis=1) if samples.ndim > 1 else samples
+        extended = np.concatenate([self.history, mono])
+        if len(extended) < SPEECH_FILTER_TAPS:
+            self.history = extended
+            return b''
+        windows = sliding_window_view(extended, SPEECH_FILTER_TAPS)[::SPEECH_DECIMATION]
+        self.history = extended[len(windows) * SPEECH_DECIMATION:]
+        pcm = np.clip(np.round(windows @ self.h * 32768), -32768, 32767).astype('<i2')
+        return pcm.tobytes()
+
+    def flush(self):
+        return self.feed(np.zeros((SPEECH_FILTER_TAPS - 1) // 2))
+
+
+def read_wav_header(stream):
+    """Channel count from a streamed WAV header, leaving the stream at the samples."""
+    header = stream.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        raise RuntimeError("ffmpeg produced no audio")
+    channels = None
+    while True:
+        chunk = stream.read(8)
+        if len(chunk) < 8:
+            raise RuntimeError("ffmpeg produced no audio")
+        chunk_id, size = struct.unpack('<4sI', chunk)
+        if chunk_id == b'data':
+            break
+        body = stream.read(size + (size & 1))
+        if chunk_id == b'fmt ':
+            channels = struct.unpack_from('<H', body, 2)[0]
+    if not channels:
+        raise RuntimeError("ffmpeg's WAV output has no format chunk")
+    return channels
+
+def decode_blocks(audio_file, block_ms=BLOCK_MS):
+    """
+    Decode an audio file through an ffmpeg pipe, one block at a time.
+
+    Yields float32 arrays of shape (samples, channels) at SAMPLE_RATE.
+    """
+    cmd = [
+        FFMPEG_BINARY,
+        '-nostdin',
+        '-loglevel', 'error',
+        '-i', audio_file,
+        '-vn',
+        '-acodec', 'pcm_f32le',
+        '-ar', str(SAMPLE_RATE),
+        '-f', 'wav',
+        '-',
+    ]
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        channels = read_wav_header(proc.stdout)
+        frame_bytes = 4 * channels
+        block_bytes = SAMPLE_RATE * block_ms // 1000 * frame_bytes
+        while True:
+            data = proc.stdout.read(block_bytes)
+            usable = len(data) - len(data) % frame_bytes
+            if not usable:
+                break
+            yield np.frombuffer(data[:usable], dtype='<f4').reshape(-1, channels)
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode('utf-8', errors='replace')
+        proc.stderr.close()
+        returncode = proc.wait()
+
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {returncode}: {stderr.strip()}")
+
+
+class AudioAnalysis:
+    """
+    One decode of an audio file, fanned out to every consumer.
+
+    Either drive it with run(), or pull speech_stream() (the transcriber
+    does) and the other consumers see each block on the way through.
+    """
+
+    def __init__(self, audio_file, silence_thresh_db=SILENCE_THRESH_DB, consumers=None):
+        if np is None:
+            raise RuntimeError("Audio analysis needs numpy: pip install numpy")
+        self.audio_file = audio_file
+        self.consumers = consumers if consumers is not None else [
+            LoudnessMeter(), SilenceMap(silence_thresh_db), WaveformPeaks()]
+        self.samples = 0
+        self.channels = 0
+
+    def blocks(self):
+        for samples in decode_blocks(self.audio_file):
+            self.samples += len(samples)
+            self.channels = samples.shape[1]
+            for consumer in self.consumers:
+                consumer.feed(samples)
+            yield samples
+
+    def speech_stream(self, chunk_length_ms=BLOCK_MS):
+        """
+        The recognizer's PCM, as transcribe_audio.stream_audio_chunks() yields it.
+
+        Yields (start_ms, end_ms, pcm_bytes) tuples of chunk_length_ms.
+        """
+        resampler = SpeechResampler()
+        bytes_per_ms = SPEECH_RATE * 2 // 1000
+        chunk_bytes = chunk_length_ms * bytes_per_ms
+        buffer = b''
+        start_ms = 0
+        for samples in self.blocks():
+            buffer += resampler.feed(samples)
+            while len(buffer) >= chunk_bytes:
+                end_ms = start_ms + chunk_length_ms
+                yield start_ms, end_ms, buffer[:chunk_bytes]
+                buffer = buffer[chunk_bytes:]
+                start_ms = end_ms
+        buffer += resampler.flush()
+        if buffer:
+            yield start_ms, start_ms + len(buffer) // bytes_per_ms, buffer
+
+    def run(self):
+        for _ in self.blocks():
+            pass
+        return self.results()
+
+    def results(self):
+        results = {
+            'version': ANALYSIS_VERSION,
+            'audio': os.path.basename(self.audio_file),
+            'duration': round(self.samples / SAMPLE_RATE, 3),
+            'channels': self.channels,
+        }
+        for consumer in self.consumers:
+            results[consumer.name] = consumer.result()
+        return results
+
+
+def default_output(audio_file):
+    return os.path.splitext(audio_file)[0] + '-analysis.json'
+
+def write_results(results, output_file):
+    tmp = output_file + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(results, f, sort_keys=True, separators=(',', ':'))
+    os.replace(tmp, output_file)
+
+def print_summary(results, output_file):
+    print(f"Duration: {results['duration']:.2f} seconds, {results['channels']} channel(s)")
+    loudness = results.get('loudness')
+    if loudness:
+        print(f"Loudness: {loudness['integrated_lufs']} LUFS integrated, LRA {loudness['loudness_range_lu']} LU, "
+              f"true peak {loudness['true_peak_dbtp']} dBTP")
+    silence = results.get('silence')
+    if silence:
+        print(f"Silence: {len(silence['pauses'])} pauses over {silence['min_silence_ms'] / 1000:g}s, "
+              f"{silence['total_seconds']:.1f}s total")
+    waveform = results.get('waveform')
+    if waveform:
+        print(f"Waveform: {waveform['points']} points")
+    print(f"Analysis: {output_file}")
+
+def update_manifest(audio_file, output_file, manifest_file=MANIFEST_FILE):
+    """Point the episode playing audio_file at its analysis; returns its number, or None."""
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    audio = os.path.relpath(os.path.abspath(audio_file), REPO_ROOT).replace(os.sep, '/')
+    analysis = os.path.relpath(os.path.abspath(output_file), REPO_ROOT).replace(os.sep, '/')
+
+    for episode in manifest.get('episodes', []):
+        if episode.get('file') == audio:
+            if episode.get('analysis') != analysis:
+                episode['analysis'] = analysis
+                tmp = manifest_file + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, indent=2, ensure_ascii=False)
+                    f.write('\n')
+                os.replace(tmp, manifest_file)
+            return episode['number']
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Loudness, silence map and waveform from one decode.")
+    parser.add_argument("audio_file")
+    parser.add_argument("output_file", nargs="?", default=None,
+                        help="JSON results (default: <audio>-analysis.json)")
+    parser.add_argument("--silence-thresh", type=float, default=SILENCE_THRESH_DB,
+                        help=f"silence level in dBFS (default {SILENCE_THRESH_DB})")
+    parser.add_argument("--update-manifest", action="store_true",
+                        help="set the episode's analysis file in episodes.json")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.audio_file):
+        print(f"Error: Audio file not found: {args.audio_file}")
+        sys.exit(1)
+
+    output_file = args.output_file or default_output(args.audio_file)
+    try:
+        results = AudioAnalysis(args.audio_file, args.silence_thresh).run()
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    write_results(results, output_file)
+    print_summary(results, output_file)
+
+    if args.update_manifest:
+        number = update_manifest(args.audio_file, output_file)
+        if number is None:
+            print("No episode in episodes.json plays this file; manifest unchanged")
+        else:
+            print(f"Episode {number}: analysis set; run tools/build_site.py to update index.html")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Generate title options and cover prompts for many transcripts at once.
+Usage: python batch_generate.py [transcript_glob ...] [--output options.json] [--workers N]
+
+With no glob, every transcript under episodes/ is processed. Transcripts are
+analyzed in parallel across CPU cores and all candidates are written to one
+JSON file. Titles that collide with an existing episode title (the episodes
+array in index.html or the episodes list in archive/compile-book.py) are
+dropped.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import ast
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from corpus_index import DEFAULT_INDEX_FILE, REPO_ROOT, CorpusIndex, load_corpus
+from generate_cover_prompt import generate_prompt
+from generate_title import generate_titles, title_to_filename
+
+DEFAULT_GLOB = os.path.join(REPO_ROOT, 'episodes', '*', 'episode-*-transcript.txt')
+DEFAULT_OUTPUT = 'generated-options.json'
+
+# Corpus loaded once per worker process (see init_worker)
+_corpus = None
+
+def normalize_title(title):
+    """Lowercase alphanumerics only, so 'DEA, Meth...' and 'dea meth...' collide."""
+    return re.sub(r'[^a-z0-9]+', ' ', title.lower()).strip()
+
+def titles_from_index_html(path):
+    """Titles in the `const episodes = [...]` array of index.html."""
+    with open(path, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    match = re.search(r'const episodes = \[(.*?)\];', html, re.S)
+    if not match:
+        return []
+    titles = re.findall(r"title:\s*'((?:[^'\\]|\\.)*)'", match.group(1))
+    return [t.replace("\\'", "'") for t in titles]
+
+def titles_from_compile_book(path):
+    """Titles in the module-level `episodes` list of compile-book.py."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == 'episodes' for target in node.targets):
+            return [episode['title'] for episode in ast.literal_eval(node.value)]
+    return []
+
+def existing_titles(root=REPO_ROOT):
+    """Normalized titles already used by published episodes."""
+    titles = []
+    index_html = os.path.join(root, 'index.html')
+    compile_book = os.path.join(root, 'archive', 'compile-book.py')
+    if os.path.exists(index_html):
+        titles.extend(titles_from_index_html(index_html))
+    if os.path.exists(compile_book):
+        titles.extend(titles_from_compile_book(compile_book))
+    return {normalize_title(t) for t in titles}
+
+def episode_number(transcript_file):
+    """'episode-007.2-transcript.txt' -> '007.2'; 'XXX' if the name doesn't say."""
+    match = re.search(r'episode-(\d+(?:\.\d+)?)', os.path.basename(transcript_file), re.I)
+    return match.group(1) if match else 'XXX'
+
+def init_worker(index_file):
+    global _corpus
+    _corpus = CorpusIndex.load(index_file) if index_file else None
+
+def analyze_transcript(transcript_file):
+    """Titles, key terms and cover prompt for one transcript (runs in a worker)."""
+    with open(transcript_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    episode_num = episode_number(transcript_file)
+    titles, key_terms = generate_titles(text, episode_num, _corpus)
+    prompt, themes, visuals = generate_prompt(text, episode_num, _corpus)
+
+    return {
+        'episode': episode_num,
+        'transcript': os.path.relpath(transcript_file, REPO_ROOT).replace(os.sep, '/'),
+        'titles': titles,
+        'key_terms': key_terms,
+        'cover_prompt': prompt,
+        'themes': themes,
+        'visuals': visuals,
+    }
+
+def batch_generate(patterns=None, output_file=DEFAULT_OUTPUT, workers=None):
+    """
+    Analyze every transcript matching the glob patterns and write one JSON file.
+
+    Returns the output dict.
+    """
+    started = time.monotonic()
+
+    files = []
+    for pattern in patterns or [DEFAULT_GLOB]:
+        files.extend(sorted(glob.glob(pattern)))
+    files = list(dict.fromkeys(files))
+    if not files:
+        print("No transcripts matched.")
+        return None
+
+    # Bring the TF-IDF index up to date once here; workers only read it
+    corpus_file = None
+    try:
+        load_corpus()
+        corpus_file = DEFAULT_INDEX_FILE
+    except OSError as e:
+        print(f"Warning: corpus index unavailable ({e}), ranking by raw counts")
+
+    taken = existing_titles()
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+    print(f"Analyzing {len(files)} transcripts on {workers} workers...")
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(corpus_file,)) as pool:
+        results = list(pool.map(analyze_transcript, files))
+
+    for result in results:
+        kept, dropped = [], []
+        for title in result['titles']:
+            (dropped if normalize_title(title) in taken else kept).append(title)
+        result['titles'] = [
+            {'title': title, 'filename': title_to_filename(title, result['episode']) + '.mp4'}
+            for title in kept
+        ]
+        result['dropped_titles'] = dropped
+
+    output = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seconds': round(time.monotonic() - started, 3),
+        'existing_titles': len(taken),
+        'episodes': results,
+    }
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2)
+
+    dropped_total = sum(len(r['dropped_titles']) for r in results)
+    print(f"Done in {output['seconds']:.2f}s: {sum(len(r['titles']) for r in results)} titles "
+          f"({dropped_total} dropped as already used)")
+    print(f"Options saved to: {output_file}")
+    return output
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate title options and cover prompts for many transcripts.")
+    parser.add_argument("patterns", nargs="*", help="transcript globs (default: every episodes/ transcript)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"JSON output file (default {DEFAULT_OUTPUT})")
+    parser.add_argument("--workers", type=int, default=None, help="parallel workers (default: CPU cores)")
+    args = parser.parse_args()
+
+    result = batch_generate(args.patterns, args.output, args.workers)
+    sys.exit(0 if result else 1)
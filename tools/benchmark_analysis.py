@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Benchmark the transcript analysis and book formatting functions.
+Usage: python benchmark_analysis.py [--sizes 10K,1M,100M] [--output results.json] [--compare old.json]
+
+Builds synthetic transcripts of each size from the real transcripts' words.
+A word-level Markov chain keeps sentence shape, capitalization, numbers and
+term frequencies realistic. Each function is then timed (best and median of
+a few runs) and its peak Python memory is measured with tracemalloc in a
+separate run, so the tracing overhead doesn't skew the timings.
+
+Benchmarked:
+  transcript_index.build     TranscriptIndex.build (the tokenizing the extractors share)
+  extract_key_terms, extract_numbers, extract_specific_nouns
+                             generate_title.py, given a prebuilt index
+  extract_key_themes, extract_specific_imagery
+                             generate_cover_prompt.py, given a prebuilt index
+  format_transcript          archive/compile-book.py
+
+The extractors get the index the same way generate_titles() passes it, so a
+cold run of one extractor costs transcript_index.build plus its own time.
+
+Results go to a JSON file with the git revision and Python version. Pass a
+previous file with --compare to print the speedup per function and size.
+Needs nothing beyond the standard library and runs offline.
+"""
+
+import argparse
+import gc
+import glob
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+from generate_cover_prompt import extract_key_themes, extract_specific_imagery
+from generate_title import extract_key_terms, extract_numbers, extract_specific_nouns
+from transcript_index import TranscriptIndex
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPILE_BOOK = os.path.join(REPO_ROOT, 'archive', 'compile-book.py')
+SOURCE_GLOBS = [
+    os.path.join(REPO_ROOT, 'episodes', '*', 'episode-*-transcript.txt'),
+    os.path.join(REPO_ROOT, 'archive', 'transcripts', '*.txt'),
+]
+
+# Bump when the JSON layout changes
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = '10K,100K,1M,10M,100M'
+DEFAULT_OUTPUT = 'benchmark-results.json'
+DEFAULT_REPEAT = 5
+DEFAULT_SEED = 1
+
+# Stop repeating a case once it has used this many seconds
+REPEAT_BUDGET_SECONDS = 10.0
+
+SIZE_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(label):
+    """'10K' -> 10240, '100M' -> 104857600, '512' -> 512."""
+    label = label.strip().upper().rstrip('B')
+    if label and label[-1] in SIZE_UNITS:
+        return int(float(label[:-1]) * SIZE_UNITS[label[-1]])
+    return int(label)
+
+def load_format_transcript():
+    """format_transcript from archive/compile-book.py (not importable by name)."""
+    spec = importlib.util.spec_from_file_location('compile_book', COMPILE_BOOK)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.format_transcript
+
+def source_words():
+    """Every word of the repo's transcripts, in order, punctuation attached."""
+    words = []
+    for pattern in SOURCE_GLOBS:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, 'r', encoding='utf-8') as f:
+                words.extend(f.read().split())
+    if not words:
+        raise RuntimeError("No transcripts found to build the synthetic vocabulary from")
+    return words
+
+def build_chain(words):
+    """Word -> list of following words (repeats keep the real frequencies)."""
+    chain = defaultdict(list)
+    for word, following in zip(words, words[1:]):
+        chain[word].append(following)
+    return dict(chain)
+
+def synthetic_transcript(chain, size, seed=DEFAULT_SEED):
+    """Random walk over the chain until the text reaches `size` characters."""
+    rng = random.Random(seed)
+    starts = list(chain)
+    parts = []
+    length = 0
+    word = rng.choice(starts)
+    while length < size:
+        parts.append(word)
+        length += len(word) + 1
+        following = chain.get(word)
+        word = rng.choice(following) if following else rng.choice(starts)
+    return ' '.join(parts)[:size]
+
+def benchmark_cases(format_transcript):
+    """
+    (name, input, run) per function. input is 'text' (run gets the text) or
+    'index' (run gets (text, index), built once per size and shared).
+    """
+    def with_index(fn):
+        return 'index', lambda args: fn(*args)
+
+    return [
+        ('transcript_index.build', 'text', TranscriptIndex.build),
+        ('extract_key_terms', *with_index(extract_key_terms)),
+        ('extract_numbers', *with_index(extract_numbers)),
+        ('extract_specific_nouns', *with_index(extract_specific_nouns)),
+        ('extract_key_themes', *with_index(extract_key_themes)),
+        ('extract_specific_imagery', *with_index(extract_specific_imagery)),
+        ('format_transcript', 'text', format_transcript),
+    ]
+
+def time_case(run, args, repeat):
+    """Run times in seconds, stopping early once REPEAT_BUDGET_SECONDS is used."""
+    times = []
+    spent = 0.0
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        run(args)
+        elapsed = time.perf_counter() - started
+        times.append(elapsed)
+        spent += elapsed
+        if spent >= REPEAT_BUDGET_SECONDS:
+            break
+    return times
+
+def peak_memory(run, args):
+    """Peak bytes allocated by Python while run(args) executes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(sizes, repeat=DEFAULT_REPEAT, only=None, measure_memory=True, seed=DEFAULT_SEED):
+    """Benchmark every case at every size; returns the results dict."""
+    chain = build_chain(source_words())
+    cases = benchmark_cases(load_format_transcript())
+    if only:
+        cases = [case for case in cases if case[0] in only]
+
+    results = []
+    for label in sizes:
+        size = parse_size(label)
+        started = time.perf_counter()
+        text = synthetic_transcript(chain, size, seed)
+        print(f"{label}: generated {len(text):,} characters in {time.perf_counter() - started:.1f}s")
+
+        inputs = {'text': text}
+        args = None
+        for name, kind, run in cases:
+            entry = {'function': name, 'size': label, 'bytes': len(text)}
+            try:
+                if kind not in inputs:
+                    inputs[kind] = (text, TranscriptIndex.build(text))
+                args = inputs[kind]
+                times = time_case(run, args, repeat)
+                entry.update({
+                    'runs': len(times),
+                    'best_seconds': min(times),
+                    'median_seconds': statistics.median(times),
+                    'mb_per_second': len(text) / 1024 ** 2 / min(times) if min(times) else None,
+                })
+                if measure_memory:
+                    entry['peak_bytes'] = peak_memory(run, args)
+            except MemoryError:
+                entry['error'] = 'MemoryError'
+            results.append(entry)
+            print(format_entry(entry))
+
+        del text, inputs, args
+        gc.collect()
+
+    return {
+        'version': RESULTS_VERSION,
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'seed': seed,
+        'results': results,
+    }
+
+def format_entry(entry):
+    if 'error' in entry:
+        return f"  {entry['function']:<26} {entry['error']}"
+    line = f"  {entry['function']:<26} {entry['best_seconds'] * 1000:>10.2f} ms best"
+    line += f"  {entry['median_seconds'] * 1000:>10.2f} ms median ({entry['runs']} runs)"
+    if 'peak_bytes' in entry:
+        line += f"  {entry['peak_bytes'] / 1024 ** 2:>9.1f} MB peak"
+    return line
+
+def compare(baseline, current):
+    """Print best-time and peak-memory ratios for cases present in both runs."""
+    old = {(e['function'], e['size']): e for e in baseline['results'] if 'error' not in e}
+    print()
+    print(f"Compared with {baseline.get('revision') or 'baseline'} ({baseline.get('generated_at')}):")
+    for entry in current['results']:
+        before = old.get((entry['function'], entry['size']))
+        if before is None or 'error' in entry:
+            continue
+        speedup = before['best_seconds'] / entry['best_seconds'] if entry['best_seconds'] else float('inf')
+        line = f"  {entry['function']:<26} {entry['size']:>5}  {speedup:6.2f}x speed"
+        if 'peak_bytes' in entry and before.get('peak_bytes'):
+            line += f"  {entry['peak_bytes'] / before['peak_bytes']:6.2f}x memory"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark transcript analysis and book formatting.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"comma-separated transcript sizes (default {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"timed runs per case, fewer for slow cases (default {DEFAULT_REPEAT})")
+    parser.add_argument("--only", default=None, help="comma-separated function names to run")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory run")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"JSON results file (default {DEFAULT_OUTPUT})")
+    parser.add_argument("--compare", default=None, metavar="BASELINE", help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    try:
+        current = run_benchmarks(args.sizes.split(','), args.repeat,
+                                 args.only.split(',') if args.only else None,
+                                 not args.no_memory, args.seed)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(current, f, indent=2)
+    print(f"Results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), current)
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Rebuild every file that lists episodes from the episode manifest.
+Usage: python build_site.py [--manifest episodes.json] [--force] [--dry-run]
+
+episodes.json (repo root) is the one place episode details are edited:
+  episodes   the current series   -> the episodes array in index.html
+  archive    the archived season  -> archive/podcast.xml (entries with "feed"),
+                                     archive/transcripts/episode-NNN.html and
+                                     archive/sitemap.xml (entries with "page"),
+                                     the episodes list in archive/compile-book.py
+  site       base URL, version badge, sitemap dates and the static pages
+
+The published copies don't all agree (a page may show an older title,
+runtime or badge, the book its own chapter title), and the build keeps them
+as published: "page" may override title, runtime and version_badge, "book"
+may override title, feed pubDate strings are taken verbatim, and "page"
+can carry text corrections made only on the page, its own template, and
+"sitemap": false for pages the sitemap doesn't list.
+
+Each output is rebuilt only when something it reads has changed: its part of
+the manifest, a transcript, the page template, compile-book.py (pages are
+split into paragraphs with the book's iter_paragraphs) or BUILD_VERSION. Those inputs
+are hashed into a key that is kept in tools/.cache/site-build.json together
+with the fingerprint of the file that was written. Editing one archive
+episode therefore rewrites that episode's page, plus the feed, sitemap or
+book list only if the edit touched what they show. A file is only written
+when its content differs, and nothing depends on the clock, so the same
+manifest always produces the same bytes.
+
+index.html, podcast.xml and compile-book.py are edited in place: only the
+generated block is replaced. Transcript pages and the sitemap are generated
+whole. Pages of episodes removed from the manifest are deleted.
+index.html includes covers/covers.js only once cover_derivatives.py has
+written it, so run that first.
+"""
+
+import argparse
+import ast
+import hashlib
+import html
+import importlib.util
+import json
+import os
+import re
+import string
+import sys
+
+from media_common import file_fingerprint
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MANIFEST = os.path.join(REPO_ROOT, 'episodes.json')
+
+# Repo-relative paths (forward slashes) of the outputs and their inputs
+INDEX_HTML = 'index.html'
+FEED_XML = 'archive/podcast.xml'
+SITEMAP_XML = 'archive/sitemap.xml'
+COMPILE_BOOK = 'archive/compile-book.py'
+TRANSCRIPTS_DIR = 'archive/transcripts'
+PAGE_TEMPLATE = 'tools/templates/transcript-page.html'
+COVERS_JS = 'covers/covers.js'
+STATE_FILE = 'tools/.cache/site-build.json'
+
+# Bump when a renderer changes so every output is rebuilt
+BUILD_VERSION = 2
+
+# The feed's generated items sit between these lines
+FEED_BEGIN = '<!-- BEGIN EPISODES: generated from episodes.json by tools/build_site.py -->'
+FEED_END = '<!-- END EPISODES -->'
+
+# The same array batch_generate.py reads titles from
+INDEX_ARRAY = re.compile(r'^(?P<indent>[ \t]*)const episodes = \[.*?\];', re.S | re.M)
+INDEX_FIELDS = ('number', 'title', 'duration', 'file', 'coverArt', 'transcript', 'summary')
+# Written only for episodes that have them (audio_analysis.py and
+# convert_to_mp4.py --stream, both with --update-manifest)
+OPTIONAL_INDEX_FIELDS = ('analysis', 'stream')
+
+# cover_derivatives.py's mapping; index.html only loads it once it exists,
+# on its own line after the footer
+COVERS_SCRIPT = f'<script src="{COVERS_JS}"></script>'
+COVERS_SCRIPT_LINE = re.compile(r'^[ \t]*' + re.escape(COVERS_SCRIPT) + r'\n', re.M)
+INDEX_FOOTER = re.compile(r'^(?P<indent>[ \t]*)</footer>\n\n', re.M)
+
+AUDIO_TYPES = {'.mp3': 'audio/mpeg', '.m4a': 'audio/x-m4a', '.mp4': 'video/mp4'}
+
+
+def repo_path(root, path):
+    return os.path.join(root, *path.split('/'))
+
+def text_escape(value):
+    return html.escape(value, quote=False)
+
+def attribute_escape(value):
+    return html.escape(value, quote=False).replace('"', '&quot;')
+
+def js_string(value):
+    return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+def runtime_seconds(runtime):
+    """'15:28' -> 928, '1:02:03' -> 3723."""
+    seconds = 0
+    for part in runtime.split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+def transcript_page_path(entry):
+    return f"{TRANSCRIPTS_DIR}/episode-{entry['code']}.html"
+
+def load_iter_paragraphs(root=REPO_ROOT):
+    """iter_paragraphs from archive/compile-book.py (not importable by name)."""
+    spec = importlib.util.spec_from_file_location('compile_book', repo_path(root, COMPILE_BOOK))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.iter_paragraphs
+
+
+# --- Renderers: manifest data (+ current file) -> new file content ---
+
+def render_index(current, episodes, covers):
+    """
+    index.html with its episodes array rebuilt, newest episode first, and
+    the covers.js include present only if covers is True.
+    """
+    current = COVERS_SCRIPT_LINE.sub('', current, count=1)
+    if covers:
+        footer = INDEX_FOOTER.search(current)
+        if not footer:
+            raise ValueError(f"{INDEX_HTML}: no '</footer>' to put the {COVERS_JS} include after")
+        current = current[:footer.end()] + footer.group('indent') + COVERS_SCRIPT + '\n' + current[footer.end():]
+
+    match = INDEX_ARRAY.search(current)
+    if not match:
+        raise ValueError(f"{INDEX_HTML}: no 'const episodes = [...];' array found")
+    indent = match.group('indent')
+    lines = []
+    for episode in sorted(episodes, key=lambda e: e['number'], reverse=True):
+        names = INDEX_FIELDS + tuple(name for name in OPTIONAL_INDEX_FIELDS if episode.get(name))
+        fields = ', '.join(f"{name}: {js_string(episode.get(name, ''))}" for name in names)
+        lines.append(f"{indent}    {{ {fields} }}")
+    array = f"{indent}const episodes = [\n" + ',\n'.join(lines) + f"\n{indent}];"
+    return current[:match.start()] + array + current[match.end():]
+
+def render_book_list(current, archive):
+    """compile-book.py with its module-level episodes list rebuilt."""
+    for node in ast.parse(current).body:
+        if isinstance(node, ast.Assign) and any(
+                isinstance(target, ast.Name) and target.id == 'episodes' for target in node.targets):
+            break
+    else:
+        raise ValueError(f"{COMPILE_BOOK}: no module-level 'episodes = [...]' list found")
+
+    entries = []
+    for entry in sorted(archive, key=lambda e: e['number']):
+        book = {'number': entry['number'], 'title': entry.get('book', {}).get('title', entry['title']),
+                'runtime': entry['runtime'], 'file': entry['transcript']}
+        fields = ', '.join(f"{json.dumps(k)}: {json.dumps(v, ensure_ascii=False)}" for k, v in book.items())
+        entries.append(f"    {{{fields}}}")
+    block = ["episodes = ["] + [line + ',' for line in entries[:-1]] + entries[-1:] + ["]"]
+
+    lines = current.split('\n')
+    lines[node.lineno - 1:node.end_lineno] = block
+    return '\n'.join(lines)
+
+def render_feed_item(site, entry):
+    feed = entry['feed']
+    audio_type = AUDIO_TYPES.get(os.path.splitext(feed['audio_url'])[1].lower(), 'audio/mpeg')
+    title = text_escape(entry['title'])
+    summary = text_escape(feed['summary'])
+    return '\n'.join([
+        f"        <!-- Episode {entry['number']} -->",
+        "        <item>",
+        f"            <title>Episode {entry['code']}: {title}</title>",
+        f"            <link>{site['base_url']}/index.html#ep{entry['code']}</link>",
+        f"            <pubDate>{feed['pub_date']}</pubDate>",
+        f"            <description>{summary}</description>",
+        "",
+        f"            <enclosure url=\"{attribute_escape(feed['audio_url'])}\" type=\"{audio_type}\" "
+        f"length=\"{feed['audio_length']}\"/>",
+        "",
+        f"            <guid isPermaLink=\"false\">undercover-fallout-ep{entry['code']}</guid>",
+        f"            <itunes:title>{title}</itunes:title>",
+        "            <itunes:episodeType>full</itunes:episodeType>",
+        f"            <itunes:episode>{entry['number']}</itunes:episode>",
+        "            <itunes:season>1</itunes:season>",
+        "            <itunes:explicit>yes</itunes:explicit>",
+        f"            <itunes:duration>{runtime_seconds(entry['runtime'])}</itunes:duration>",
+        f"            <itunes:summary>{summary}</itunes:summary>",
+        "        </item>",
+    ])
+
+def render_feed(current, site, archive):
+    """podcast.xml with the items between the markers rebuilt, newest first."""
+    begin, end = current.find(FEED_BEGIN), current.find(FEED_END)
+    if begin == -1 or end < begin:
+        raise ValueError(f"{FEED_XML}: episode markers not found ({FEED_BEGIN} ... {FEED_END})")
+    items = [render_feed_item(site, entry)
+             for entry in sorted(archive, key=lambda e: e['number'], reverse=True) if 'feed' in entry]
+    block = FEED_BEGIN + '\n' + '\n\n'.join(items) + '\n        ' + FEED_END
+    return current[:begin] + block + current[end + len(FEED_END):]
+
+def render_sitemap(site, archive):
+    urls = [(page['path'], site['lastmod'], page['changefreq'], page['priority']) for page in site['pages']]
+    transcripts = site['transcripts']
+    urls.extend((transcript_page_path(entry)[len('archive/'):],
+                 entry['page'].get('lastmod', site['lastmod']),
+                 transcripts['changefreq'], transcripts['priority'])
+                for entry in sorted(archive, key=lambda e: e['number'])
+                if 'page' in entry and entry['page'].get('sitemap', True))
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for path, lastmod, changefreq, priority in urls:
+        lines.extend([
+            "  <url>",
+            f"    <loc>{text_escape(site['base_url'] + '/' + path)}</loc>",
+            f"    <lastmod>{lastmod}</lastmod>",
+            f"    <changefreq>{changefreq}</changefreq>",
+            f"    <priority>{priority}</priority>",
+            "  </url>",
+        ])
+    lines.append('</urlset>')
+    return '\n'.join(lines) + '\n'
+
+def render_page(template, site, entry, transcript, iter_paragraphs):
+    """A transcript page, one <p> per paragraph as the book splits them."""
+    page = entry['page']
+    title = page.get('title', entry['title'])
+    for old, new in page.get('corrections', []):
+        if old not in transcript:
+            raise ValueError(f"{entry['transcript']}: correction text not found: {old!r}")
+        transcript = transcript.replace(old, new)
+    return string.Template(template).substitute(
+        code=entry['code'],
+        title=text_escape(title),
+        description=attribute_escape(
+            f"Full transcript of UNDERCOVER FALLOUT Episode {entry['code']}: {title}. {page['description']}"),
+        keywords=attribute_escape(', '.join(page['keywords'])),
+        version_badge=text_escape(page.get('version_badge', site['version_badge'])),
+        runtime=page.get('runtime', entry['runtime']),
+        released=text_escape(page['released']),
+        tags='\n'.join(f'                <span class="tag">{text_escape(tag)}</span>' for tag in page['tags']),
+        paragraphs='\n'.join(f'                <p>{text_escape(paragraph)}</p>'
+                             for paragraph in iter_paragraphs(transcript)),
+    )
+
+
+# --- Build ---
+
+def read_text(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+def write_text(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+def load_state(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {'inputs': {}, 'outputs': {}}
+    state.setdefault('inputs', {})
+    state.setdefault('outputs', {})
+    return state
+
+def targets(manifest, root=REPO_ROOT):
+    """
+    (output path, manifest data it shows, input files it reads, render) per
+    output. render(read) gets a function that returns an input file's text
+    and returns the new content of the output.
+    """
+    site, archive = manifest['site'], manifest['archive']
+    covers = os.path.exists(repo_path(root, COVERS_JS))
+    book_fields = [{key: entry.get(key) for key in ('number', 'title', 'runtime', 'transcript', 'book')}
+                   for entry in archive]
+    feed_fields = [{key: entry[key] for key in ('number', 'code', 'title', 'runtime', 'feed')}
+                   for entry in archive if 'feed' in entry]
+    sitemap_fields = [(entry['code'], entry['page'].get('lastmod'), entry['page'].get('sitemap', True))
+                      for entry in archive if 'page' in entry]
+
+    result = [
+        (INDEX_HTML, [manifest['episodes'], covers], [],
+         lambda read: render_index(read(INDEX_HTML), manifest['episodes'], covers)),
+        (FEED_XML, [site['base_url'], feed_fields], [],
+         lambda read: render_feed(read(FEED_XML), site, archive)),
+        (SITEMAP_XML, [site['base_url'], site['lastmod'], site['pages'], site['transcripts'], sitemap_fields], [],
+         lambda read: render_sitemap(site, archive)),
+        (COMPILE_BOOK, book_fields, [],
+         lambda read: render_book_list(read(COMPILE_BOOK), archive)),
+    ]
+    pages = sorted((entry for entry in archive if 'page' in entry), key=lambda e: e['number'])
+    iter_paragraphs = load_iter_paragraphs(root) if pages else None
+    for entry in pages:
+        transcript = f"{TRANSCRIPTS_DIR}/{entry['transcript']}"
+        template = entry['page'].get('template', PAGE_TEMPLATE)
+        page_fields = [site['version_badge'],
+                       {key: entry[key] for key in ('code', 'title', 'runtime', 'page')}]
+        result.append((
+            transcript_page_path(entry), page_fields, [template, transcript, COMPILE_BOOK],
+            lambda read, entry=entry, template=template, transcript=transcript:
+                render_page(read(template), site, entry, read(transcript), iter_paragraphs),
+        ))
+    return result
+
+def build_site(manifest_file=DEFAULT_MANIFEST, root=REPO_ROOT, force=False, dry_run=False):
+    """
+    Bring every generated file up to date with the manifest.
+
+    Returns True if every output was built.
+    """
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    state_file = repo_path(root, STATE_FILE)
+    previous = load_state(state_file)
+    state = {'version': BUILD_VERSION, 'inputs': {}, 'outputs': {}}
+    written, unchanged, failed = [], 0, []
+
+    def read(path):
+        return read_text(repo_path(root, path))
+
+    outputs = targets(manifest, root)
+    for output, data, inputs, render in outputs:
+        output_file = repo_path(root, output)
+        try:
+            for path in inputs:
+                state['inputs'][path] = file_fingerprint(repo_path(root, path), previous['inputs'].get(path))
+        except OSError as e:
+            print(f"  FAILED {output}: {e}")
+            failed.append(output)
+            if output in previous['outputs']:
+                state['outputs'][output] = previous['outputs'][output]
+            continue
+
+        key = hashlib.sha256(json.dumps({
+            'version': BUILD_VERSION,
+            'data': data,
+            'inputs': {path: state['inputs'][path]['sha256'] for path in inputs},
+        }, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+        recorded = previous['outputs'].get(output)
+        if not force and recorded and recorded['key'] == key and os.path.exists(output_file):
+            # Skip without rendering unless the file was changed since it was written
+            fingerprint = file_fingerprint(output_file, recorded['output'])
+            if fingerprint['sha256'] == recorded['output']['sha256']:
+                state['outputs'][output] = {'key': key, 'output': fingerprint}
+                unchanged += 1
+                continue
+
+        try:
+            content = render(read)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  FAILED {output}: {e}")
+            failed.append(output)
+            if recorded:
+                state['outputs'][output] = recorded
+            continue
+
+        current = read(output) if os.path.exists(output_file) else None
+        if content != current:
+            written.append(output)
+            print(f"  {'Would write' if dry_run else 'Wrote'} {output}")
+            if not dry_run:
+                write_text(output_file, content)
+        else:
+            unchanged += 1
+        if not dry_run:
+            state['outputs'][output] = {'key': key, 'output': file_fingerprint(output_file)}
+
+    # Pages of episodes that left the manifest (or lost their "page" entry)
+    current_outputs = {output for output, *_ in outputs}
+    removed = [output for output in previous['outputs'] if output not in current_outputs]
+    for output in removed:
+        output_file = repo_path(root, output)
+        if os.path.exists(output_file):
+            print(f"  {'Would remove' if dry_run else 'Removed'} {output}")
+            if not dry_run:
+                os.remove(output_file)
+
+    if not dry_run:
+        write_text(state_file, json.dumps(state, indent=2, sort_keys=True))
+
+    print()
+    print("=" * 60)
+    print(f"Site: {len(written)} {'to write' if dry_run else 'written'}, {unchanged} up to date, "
+          f"{len(removed)} removed")
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+    print("=" * 60)
+    return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the episode lists, feed, sitemap and transcript pages.")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="episode manifest (default: episodes.json)")
+    parser.add_argument("--force", action="store_true", help="rebuild every output, even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="show what would change without writing")
+    args = parser.parse_args()
+
+    try:
+        success = build_site(args.manifest, force=args.force, dry_run=args.dry_run)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    sys.exit(0 if success else 1)
@@ -2,18 +2,305 @@
 """
 Convert audio file to MP4 video with static image.
 Usage: python convert_to_mp4.py <audio_file> <image_file> [output_file]
+                                [--max-size-mb 95] [--reencode-audio]
+       python convert_to_mp4.py --stream <audio_file> [output_dir] [--update-manifest]
+       python convert_to_mp4.py --batch [episodes_dir] [--stream] [--workers N] [--force]
+Common options: [--stall-timeout 120] [--timing-log timings.jsonl]
 
 If no output file is specified, it will use the audio filename with .mp4 extension.
+Batch mode converts every episodes/NNN-*/ folder with an audio file and a cover,
+in parallel, skipping outputs whose inputs and settings are unchanged.
+
+AAC/MP3/ALAC audio is copied into the MP4 unchanged. Bitrates are planned from
+the probed duration so the output lands under the size limit on the first pass.
+Progress (percent, encode speed, bytes written) is read live from ffmpeg's
+-progress output, and an encode that stops advancing is killed.
+
+--stream makes the files the site player streams instead, in one ffmpeg run
+with the audio copied (never re-encoded unless it can't go in fMP4/HLS or
+can't fit the size limit), into <audio>-stream/:
+  audio.m4a      fragmented MP4 with the moov and a global sidx index up
+                 front, so playback starts after the first fragment and a
+                 seek is one range request
+  index.m3u8     HLS playlist over init.mp4 + segment-NNNNN.m4s (6 s each)
+--update-manifest points the episode's `file` at audio.m4a and its `stream`
+at the playlist; run build_site.py afterwards.
 """
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import glob
+import json
+import queue
+import re
 import subprocess
 import sys
+import threading
+import time
 import os
+import shutil
+
+from media_common import FFMPEG_BINARY, FFMPEG_PATH, FFPROBE_BINARY, file_fingerprint
+from probe_media import probe_mp4, read_mp4_info
+
+# Audio codecs the MP4 container can carry as-is
+MP4_AUDIO_CODECS = {'aac', 'mp3', 'alac'}
+
+# GitHub rejects files over 100 MB; keep a margin
+DEFAULT_MAX_SIZE_MB = 95
+
+# Bitrate used when audio has to be re-encoded
+AUDIO_BITRATE_KBPS = 192
+
+# Fraction of the size budget reserved for MP4 headers and muxing overhead
+CONTAINER_OVERHEAD = 0.02
+
+# Below this the still image gets visibly blocky, so warn if the budget forces it
+MIN_VIDEO_KBPS = 16
+
+# Lowest AAC bitrate worth encoding speech at; a budget that can't hold it is an error
+MIN_AUDIO_KBPS = 32
+
+# Batch mode: which files in an episode folder are the inputs
+AUDIO_EXTENSIONS = ['.m4a', '.mp3', '.wav']
+COVER_PATTERNS = ['episode-*-cover.png', 'episode-*-cover.jpg', '*.png', '*.jpg']
+
+# Bump when the ffmpeg command changes in a way that alters the output
+ENCODER_VERSION = 1
+
+# Kill an encode whose output position hasn't moved for this many seconds
+DEFAULT_STALL_TIMEOUT = 120
+
+# Lines of ffmpeg's stderr kept for error reports
+STDERR_TAIL_LINES = 40
+
+# Streaming output (--stream): fragment and HLS segment lengths, and the codecs
+# browsers play from fMP4/HLS as they are
+STREAM_FRAGMENT_SECONDS = 2
+HLS_SEGMENT_SECONDS = 6
+STREAM_AUDIO_CODECS = {'aac', 'mp3'}
+
+# Files in the <audio>-stream/ folder
+STREAM_AUDIO_NAME = 'audio.m4a'
+STREAM_PLAYLIST_NAME = 'index.m3u8'
+STREAM_INIT_NAME = 'init.mp4'
+STREAM_SEGMENT_PATTERN = 'segment-%05d.m4s'
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MANIFEST_FILE = os.path.join(REPO_ROOT, 'episodes.json')
+
+# Batch mode's record of the inputs and settings each output was built from;
+# per machine, kept with the other build state rather than in episodes/
+BATCH_STATE_FILE = os.path.join(REPO_ROOT, 'tools', '.cache', 'convert-batch.json')
+
+def probe_audio(audio_file):
+    """
+    Read duration, codec and bitrate of the first audio stream.
 
-# FFmpeg path (installed via winget)
-FFMPEG_PATH = r"C:\Users\rober\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-8.0.1-full_build\bin\ffmpeg.exe"
+    MP4/M4A files are read from their headers (probe_media.py); anything
+    else, or an MP4 the header parser can't handle, goes to ffprobe.
 
-def convert_audio_to_mp4(audio_file, image_file, output_file=None):
+    Returns a dict with 'duration' (seconds), 'codec' and 'bit_rate' (bits/s,
+    or None if unknown), or None if the file could not be probed.
+    """
+    probe = probe_mp4(audio_file)
+    if probe:
+        return probe
+
+    cmd = [
+        FFPROBE_BINARY,
+        '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=codec_name,bit_rate:format=duration,bit_rate',
+        '-of', 'json',
+        audio_file
+    ]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        info = json.loads(result.stdout)
+        stream = info['streams'][0]
+        fmt = info['format']
+        duration = float(fmt['duration'])
+    except (OSError, ValueError, KeyError, IndexError):
+        return None
+    if duration <= 0:
+        return None
+
+    # Stream bitrate isn't always in the container; fall back to the overall rate
+    bit_rate = stream.get('bit_rate') or fmt.get('bit_rate')
+    return {
+        'duration': duration,
+        'codec': stream.get('codec_name'),
+        'bit_rate': int(bit_rate) if bit_rate else None,
+    }
+
+def size_budget_kbps(probe, max_size_mb, reserved_kbps=0):
+    """
+    Total bitrate (kbps) an output as long as the probed audio can use and
+    still fit max_size_mb.
+
+    Raises ValueError if the duration is unknown, or if the budget can't
+    hold MIN_AUDIO_KBPS plus reserved_kbps (what the rest of the output
+    needs at least, e.g. the picture).
+    """
+    duration = probe.get('duration')
+    if not duration or duration <= 0:
+        raise ValueError("audio duration is unknown")
+
+    budget_kbps = max_size_mb * 8 * 1024 * 1024 * (1 - CONTAINER_OVERHEAD) / duration / 1000
+    if budget_kbps < MIN_AUDIO_KBPS + reserved_kbps:
+        raise ValueError(f"{max_size_mb} MB is too small for {duration / 60:.1f} min "
+                         f"(needs at least {MIN_AUDIO_KBPS + reserved_kbps}k, the budget allows "
+                         f"{budget_kbps:.0f}k); raise --max-size-mb")
+    return budget_kbps
+
+def plan_encode(probe, max_size_mb=DEFAULT_MAX_SIZE_MB, copy_audio=True):
+    """
+    Decide audio handling and bitrates so the output fits max_size_mb in one pass.
+
+    Returns a dict with 'copy_audio', 'audio_kbps' and 'video_kbps'
+    (video_kbps is used as the encoder's maxrate cap). Raises ValueError
+    if the budget can't hold the minimum audio and video bitrates.
+    """
+    budget_kbps = size_budget_kbps(probe, max_size_mb, MIN_VIDEO_KBPS)
+
+    source_kbps = probe['bit_rate'] / 1000 if probe['bit_rate'] else None
+    can_copy = copy_audio and probe['codec'] in MP4_AUDIO_CODECS and source_kbps is not None
+
+    # Copying is only an option if the source audio leaves room for the picture
+    if can_copy and source_kbps + MIN_VIDEO_KBPS <= budget_kbps:
+        audio_kbps = source_kbps
+    else:
+        can_copy = False
+        audio_kbps = max(MIN_AUDIO_KBPS, min(AUDIO_BITRATE_KBPS, int((budget_kbps - MIN_VIDEO_KBPS) * 0.9)))
+
+    return {
+        'copy_audio': can_copy,
+        'audio_kbps': audio_kbps,
+        'video_kbps': max(MIN_VIDEO_KBPS, int(budget_kbps - audio_kbps)),
+    }
+
+def run_ffmpeg(cmd, duration=None, stall_timeout=DEFAULT_STALL_TIMEOUT, show_progress=True):
+    """
+    Run ffmpeg, following its machine-readable -progress output line by line.
+
+    Percent done (when duration is known), encode speed and bytes written are
+    printed as they arrive. If the output position stops advancing for
+    stall_timeout seconds, ffmpeg is killed.
+
+    Returns (returncode, stderr_tail, progress) where progress is the last
+    progress block as a dict and returncode is None if the encode stalled.
+    """
+    cmd = cmd[:1] + ['-nostats', '-progress', 'pipe:1'] + cmd[1:]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            text=True, encoding='utf-8', errors='replace')
+
+    # Readers run in threads so neither pipe can fill up and block ffmpeg,
+    # and so the stall check isn't stuck behind a blocking readline()
+    lines = queue.Queue()
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    def read_stdout():
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def read_stderr():
+        for line in proc.stderr:
+            stderr_tail.append(line)
+
+    readers = [threading.Thread(target=read_stdout, daemon=True),
+               threading.Thread(target=read_stderr, daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    block = {}
+    progress = {}
+    last_position = -1
+    last_advance = time.monotonic()
+    stalled = False
+
+    while True:
+        try:
+            line = lines.get(timeout=1)
+        except queue.Empty:
+            line = ''
+        if line is None:
+            break
+
+        if '=' in line:
+            key, _, value = line.strip().partition('=')
+            block[key] = value
+            if key == 'progress':
+                # A block ends with progress=continue|end
+                progress = block
+                block = {}
+                position = parse_out_time(progress)
+                if position > last_position:
+                    last_position = position
+                    last_advance = time.monotonic()
+                if show_progress:
+                    print_progress(progress, duration)
+
+        if time.monotonic() - last_advance > stall_timeout:
+            stalled = True
+            proc.kill()
+            break
+
+    returncode = proc.wait()
+    for reader in readers:
+        reader.join(timeout=1)
+    if show_progress:
+        print()
+
+    return (None if stalled else returncode), ''.join(stderr_tail), progress
+
+def print_progress(progress, duration):
+    """Print one updating status line from an ffmpeg progress block."""
+    out_time = parse_out_time(progress)
+    size_mb = parse_int(progress.get('total_size')) / (1024 * 1024)
+    speed = progress.get('speed', 'N/A').strip()
+
+    parts = []
+    if duration:
+        percent = min(100.0, out_time / duration * 100)
+        parts.append(f"{percent:5.1f}%")
+        factor = parse_speed(speed)
+        if factor:
+            parts.append(f"ETA {max(0.0, (duration - out_time) / factor):.0f}s")
+    parts.append(f"{out_time / 60:.1f} min encoded")
+    parts.append(f"speed {speed}")
+    parts.append(f"{size_mb:.1f} MB written")
+    print("\r  " + " | ".join(parts) + "   ", end="", flush=True)
+
+def parse_int(value):
+    """Integer progress field; ffmpeg reports N/A before it knows a value."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def parse_out_time(progress):
+    """Output position in seconds from a progress block."""
+    return parse_int(progress.get('out_time_us')) / 1_000_000
+
+def parse_speed(speed):
+    """'1.5x' -> 1.5; None when ffmpeg reports N/A."""
+    try:
+        return float(speed.rstrip('x'))
+    except ValueError:
+        return None
+
+def write_timing(timing_log, record):
+    """Append one JSON timing record to timing_log."""
+    with open(timing_log, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, sort_keys=True) + "\n")
+
+def convert_audio_to_mp4(audio_file, image_file, output_file=None,
+                         max_size_mb=DEFAULT_MAX_SIZE_MB, copy_audio=True, threads=None,
+                         stall_timeout=DEFAULT_STALL_TIMEOUT, timing_log=None, show_progress=True):
     """
     Convert an audio file to MP4 video using a static image.
 
@@ -21,6 +308,12 @@ def convert_audio_to_mp4(audio_file, image_file, output_file=None):
         audio_file: Path to audio file (.m4a, .mp3, etc.)
         image_file: Path to image file (.jpg, .png, etc.)
         output_file: Optional output path. Defaults to audio filename with .mp4 extension.
+        max_size_mb: Size budget for the output file in MB
+        copy_audio: Copy MP4-compatible audio unchanged instead of re-encoding
+        threads: Encoder threads (None lets ffmpeg use every core)
+        stall_timeout: Seconds without progress before the encode is killed
+        timing_log: Optional JSONL file to append a timing record to
+        show_progress: Print a live progress line while encoding
     """
 
     if not os.path.exists(audio_file):
@@ -31,8 +324,8 @@ def convert_audio_to_mp4(audio_file, image_file, output_file=None):
         print(f"Error: Image file not found: {image_file}")
         return False
 
-    if not os.path.exists(FFMPEG_PATH):
-        print(f"Error: FFmpeg not found at: {FFMPEG_PATH}")
+    if not shutil.which(FFMPEG_BINARY):
+        print(f"Error: FFmpeg not found at {FFMPEG_PATH} or on PATH")
         return False
 
     # Generate output filename if not provided
@@ -45,60 +338,512 @@ def convert_audio_to_mp4(audio_file, image_file, output_file=None):
     print(f"  Image: {image_file}")
     print(f"  Output: {output_file}")
 
+    probe = probe_audio(audio_file)
+    if probe:
+        try:
+            plan = plan_encode(probe, max_size_mb, copy_audio)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return False
+        source_kbps = f"{probe['bit_rate'] / 1000:.0f}k" if probe['bit_rate'] else "unknown bitrate"
+        print(f"  Source: {probe['codec']} {source_kbps}, {probe['duration'] / 60:.1f} min")
+        if plan['copy_audio']:
+            print(f"  Audio: copy ({plan['audio_kbps']:.0f}k)")
+        else:
+            print(f"  Audio: re-encode to AAC {plan['audio_kbps']:.0f}k")
+        print(f"  Video: up to {plan['video_kbps']}k (budget {max_size_mb} MB)")
+        if plan['video_kbps'] <= MIN_VIDEO_KBPS:
+            print("  Warning: size budget leaves almost nothing for the image")
+    else:
+        # Couldn't probe: fall back to the fixed settings without a size plan
+        print("  Warning: could not probe audio, using default settings")
+        plan = None
+
     # FFmpeg command to combine static image with audio
     # -loop 1: loop the image
     # -i: input files
     # -c:v libx264: video codec
     # -tune stillimage: optimize for static image
-    # -c:a aac: audio codec
-    # -b:a 192k: audio bitrate
+    # -maxrate/-bufsize: cap the video bitrate so the file fits the size budget
+    # -c:a copy: keep AAC audio as-is; otherwise -c:a aac -b:a <rate>
     # -pix_fmt yuv420p: pixel format for compatibility
     # -shortest: finish when shortest input ends (the audio)
 
     cmd = [
-        FFMPEG_PATH,
+        FFMPEG_BINARY,
         '-loop', '1',
         '-i', image_file,
         '-i', audio_file,
+        '-map', '0:v:0',
+        '-map', '1:a:0',
         '-c:v', 'libx264',
         '-tune', 'stillimage',
-        '-c:a', 'aac',
-        '-b:a', '192k',
+    ]
+
+    if plan:
+        cmd += ['-maxrate', f"{plan['video_kbps']}k", '-bufsize', f"{plan['video_kbps'] * 2}k"]
+        if plan['copy_audio']:
+            cmd += ['-c:a', 'copy']
+        else:
+            cmd += ['-c:a', 'aac', '-b:a', f"{plan['audio_kbps']}k"]
+    else:
+        cmd += ['-c:a', 'aac', '-b:a', f"{AUDIO_BITRATE_KBPS}k"]
+
+    if threads:
+        cmd += ['-threads', str(threads)]
+
+    cmd += [
         '-pix_fmt', 'yuv420p',
         '-shortest',
         '-y',  # Overwrite output file if exists
         output_file
     ]
 
+    duration = probe['duration'] if probe else None
+    started = time.monotonic()
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        returncode, stderr, progress = run_ffmpeg(cmd, duration, stall_timeout, show_progress)
+    except Exception as e:
+        print(f"\nException during conversion: {e}")
+        return False
+    elapsed = time.monotonic() - started
 
-        if result.returncode == 0:
-            file_size = os.path.getsize(output_file) / (1024 * 1024)
-            print(f"\nSuccess! Created: {output_file}")
-            print(f"File size: {file_size:.2f} MB")
-            return True
-        else:
-            print(f"\nError during conversion:")
-            print(result.stderr)
+    size_bytes = os.path.getsize(output_file) if os.path.exists(output_file) else 0
+    timing = {
+        'output': output_file,
+        'audio': audio_file,
+        'status': 'stalled' if returncode is None else ('ok' if returncode == 0 else 'failed'),
+        'wall_seconds': round(elapsed, 3),
+        'media_seconds': round(duration, 3) if duration else None,
+        'speed': round(duration / elapsed, 2) if duration and elapsed else None,
+        'size_bytes': size_bytes,
+        'copy_audio': plan['copy_audio'] if plan else False,
+        'audio_kbps': plan['audio_kbps'] if plan else AUDIO_BITRATE_KBPS,
+        'video_kbps': plan['video_kbps'] if plan else None,
+        'threads': threads,
+        'encoder_version': ENCODER_VERSION,
+        'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    if timing_log:
+        write_timing(timing_log, timing)
+
+    if returncode is None:
+        print(f"\nError: ffmpeg made no progress for {stall_timeout}s and was killed")
+        print(stderr)
+        return False
+
+    if returncode != 0:
+        print("\nError during conversion:")
+        print(stderr)
+        return False
+
+    file_size = size_bytes / (1024 * 1024)
+    print(f"\nSuccess! Created: {output_file}")
+    print(f"File size: {file_size:.2f} MB")
+    if timing['speed']:
+        print(f"Encode time: {elapsed:.1f}s ({timing['speed']}x realtime)")
+    else:
+        print(f"Encode time: {elapsed:.1f}s")
+    if file_size > max_size_mb:
+        print(f"Warning: output is over the {max_size_mb} MB budget")
+    return True
+
+def stream_output_dir(audio_file):
+    return os.path.splitext(audio_file)[0] + '-stream'
+
+def convert_to_stream(audio_file, output_dir=None, max_size_mb=DEFAULT_MAX_SIZE_MB, copy_audio=True,
+                      threads=None, stall_timeout=DEFAULT_STALL_TIMEOUT, timing_log=None,
+                      show_progress=True):
+    """
+    Write the fragmented MP4 and the HLS segments for an audio file in one ffmpeg run.
+
+    Both outputs mux the same demuxed audio, copied when its codec streams as
+    is and it fits max_size_mb. They are built in <output_dir>.tmp and
+    swapped in only once the fragmented file checks out, so the player never
+    sees a half-written folder.
+
+    Args:
+        audio_file: Path to audio file (.m4a, .mp3, etc.)
+        output_dir: Folder for the stream files. Defaults to <audio>-stream
+        max_size_mb: Size limit for the fragmented file in MB
+        copy_audio: Copy AAC/MP3 audio unchanged instead of re-encoding
+    """
+
+    if not os.path.exists(audio_file):
+        print(f"Error: Audio file not found: {audio_file}")
+        return False
+
+    if not shutil.which(FFMPEG_BINARY):
+        print(f"Error: FFmpeg not found at {FFMPEG_PATH} or on PATH")
+        return False
+
+    if output_dir is None:
+        output_dir = stream_output_dir(audio_file)
+
+    print("Segmenting for streaming...")
+    print(f"  Audio: {audio_file}")
+    print(f"  Output: {output_dir}")
+
+    probe = probe_audio(audio_file)
+    audio_kbps = AUDIO_BITRATE_KBPS
+    copy = copy_audio and probe is not None and probe['codec'] in STREAM_AUDIO_CODECS
+    if probe:
+        try:
+            budget_kbps = size_budget_kbps(probe, max_size_mb)
+        except ValueError as e:
+            print(f"Error: {e}")
             return False
+        source_kbps = probe['bit_rate'] / 1000 if probe['bit_rate'] else None
+        if copy and source_kbps and source_kbps > budget_kbps:
+            # Copying would break the size limit; re-encoding is the only way under it
+            copy = False
+        if not copy:
+            audio_kbps = max(MIN_AUDIO_KBPS, min(AUDIO_BITRATE_KBPS, int(budget_kbps * 0.9)))
+        print(f"  Source: {probe['codec']} {f'{source_kbps:.0f}k' if source_kbps else 'unknown bitrate'}, "
+              f"{probe['duration'] / 60:.1f} min")
+    else:
+        print("  Warning: could not probe audio, re-encoding with default settings")
+    print(f"  Audio: {'copy' if copy else f're-encode to AAC {audio_kbps}k'}")
+
+    audio_args = ['-map', '0:a:0', '-c:a', 'copy'] if copy else ['-map', '0:a:0', '-c:a', 'aac', '-b:a', f"{audio_kbps}k"]
+    if threads:
+        audio_args += ['-threads', str(threads)]
+
+    tmp_dir = output_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
 
+    # One input, two outputs: the demuxed (or encoded) audio goes to both muxers
+    # -movflags empty_moov: moov (no samples) first, then moof+mdat fragments
+    # -movflags global_sidx: one index of every fragment, moved up front when muxing ends
+    # -frag_duration: fragment length in microseconds
+    # -hls_segment_type fmp4: segments share init.mp4, so AAC needs no ADTS rewrap
+    cmd = [
+        FFMPEG_BINARY,
+        '-i', audio_file,
+        *audio_args,
+        '-movflags', '+empty_moov+default_base_moof+global_sidx',
+        '-frag_duration', str(STREAM_FRAGMENT_SECONDS * 1_000_000),
+        '-y', os.path.join(tmp_dir, STREAM_AUDIO_NAME),
+        *audio_args,
+        '-f', 'hls',
+        '-hls_time', str(HLS_SEGMENT_SECONDS),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_type', 'fmp4',
+        '-hls_fmp4_init_filename', STREAM_INIT_NAME,
+        '-hls_segment_filename', os.path.join(tmp_dir, STREAM_SEGMENT_PATTERN),
+        '-y', os.path.join(tmp_dir, STREAM_PLAYLIST_NAME),
+    ]
+
+    duration = probe['duration'] if probe else None
+    started = time.monotonic()
+    try:
+        returncode, stderr, progress = run_ffmpeg(cmd, duration, stall_timeout, show_progress)
     except Exception as e:
-        print(f"\nException during conversion: {e}")
+        print(f"\nException during segmenting: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
         return False
+    elapsed = time.monotonic() - started
+
+    sizes = {name: os.path.getsize(os.path.join(tmp_dir, name)) for name in os.listdir(tmp_dir)}
+    problem = None
+    if returncode is None:
+        problem = f"ffmpeg made no progress for {stall_timeout}s and was killed"
+    elif returncode != 0:
+        problem = "ffmpeg failed"
+    else:
+        try:
+            info = read_mp4_info(os.path.join(tmp_dir, STREAM_AUDIO_NAME))
+        except (OSError, ValueError) as e:
+            info = None
+            problem = f"{STREAM_AUDIO_NAME} is unreadable: {e}"
+        if info and not (info['fragmented'] and info['fast_start']):
+            problem = f"{STREAM_AUDIO_NAME} is not a fragmented fast-start MP4"
+        elif STREAM_PLAYLIST_NAME not in sizes:
+            problem = f"ffmpeg wrote no {STREAM_PLAYLIST_NAME}"
+        elif max(sizes.values()) > max_size_mb * 1024 * 1024:
+            problem = f"{max(sizes, key=sizes.get)} is over the {max_size_mb} MB limit"
+
+    if timing_log:
+        write_timing(timing_log, {
+            'output': output_dir,
+            'audio': audio_file,
+            'mode': 'stream',
+            'status': 'stalled' if returncode is None else ('ok' if not problem else 'failed'),
+            'wall_seconds': round(elapsed, 3),
+            'media_seconds': round(duration, 3) if duration else None,
+            'speed': round(duration / elapsed, 2) if duration and elapsed else None,
+            'size_bytes': sum(sizes.values()),
+            'copy_audio': copy,
+            'audio_kbps': None if copy else audio_kbps,
+            'threads': threads,
+            'encoder_version': ENCODER_VERSION,
+            'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+
+    if problem:
+        print(f"\nError: {problem}")
+        if returncode != 0:
+            print(stderr)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+
+    segments = [sizes[name] for name in sizes if name.endswith('.m4s')]
+    print(f"\nSuccess! Created: {output_dir}")
+    print(f"  {STREAM_AUDIO_NAME}: {sizes[STREAM_AUDIO_NAME] / (1024 * 1024):.2f} MB, "
+          f"{STREAM_FRAGMENT_SECONDS}s fragments")
+    print(f"  {STREAM_PLAYLIST_NAME}: {len(segments)} segments of {HLS_SEGMENT_SECONDS}s, "
+          f"largest {max(segments, default=0) / 1024:.0f} KB")
+    print(f"Encode time: {elapsed:.1f}s")
+    return True
+
+def point_manifest_at_stream(audio_file, output_dir, manifest_file=MANIFEST_FILE):
+    """
+    Set `file` and `stream` of the episode playing audio_file (or already
+    playing its stream); returns the episode number, or None if none matches.
+    """
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    def relative(path):
+        return os.path.relpath(os.path.abspath(path), REPO_ROOT).replace(os.sep, '/')
+
+    fragmented = relative(os.path.join(output_dir, STREAM_AUDIO_NAME))
+    playlist = relative(os.path.join(output_dir, STREAM_PLAYLIST_NAME))
+    for episode in manifest.get('episodes', []):
+        if episode.get('file') in (relative(audio_file), fragmented):
+            if (episode.get('file'), episode.get('stream')) != (fragmented, playlist):
+                episode['file'] = fragmented
+                episode['stream'] = playlist
+                tmp = manifest_file + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, indent=2, ensure_ascii=False)
+                    f.write('\n')
+                os.replace(tmp, manifest_file)
+            return episode['number']
+    return None
+
+def find_episode_jobs(episodes_dir, stream=False):
+    """
+    Find (audio_file, image_file, output_file) for every episodes/NNN-*/ folder.
+
+    Folders without both an audio file and a cover image are skipped. With
+    stream, the cover isn't needed and output_file is the stream folder.
+    """
+    jobs = []
+    for folder in sorted(glob.glob(os.path.join(episodes_dir, '*'))):
+        if not os.path.isdir(folder) or not re.match(r'\d{3}-', os.path.basename(folder)):
+            continue
+
+        audio_file = None
+        for ext in AUDIO_EXTENSIONS:
+            matches = sorted(glob.glob(os.path.join(folder, '*' + ext)))
+            if matches:
+                audio_file = matches[0]
+                break
+
+        image_file = None
+        for pattern in COVER_PATTERNS:
+            matches = sorted(glob.glob(os.path.join(folder, pattern)))
+            if matches:
+                image_file = matches[0]
+                break
+
+        if audio_file and stream:
+            jobs.append((audio_file, None, stream_output_dir(audio_file)))
+        elif audio_file and image_file:
+            output_file = os.path.splitext(audio_file)[0] + '.mp4'
+            jobs.append((audio_file, image_file, output_file))
+    return jobs
+
+def convert_batch(episodes_dir, workers=None, max_size_mb=DEFAULT_MAX_SIZE_MB,
+                  copy_audio=True, force=False, stall_timeout=DEFAULT_STALL_TIMEOUT,
+                  timing_log=None, stream=False):
+    """
+    Convert every episode folder in parallel, skipping up-to-date outputs.
+
+    An output is up to date when it exists and BATCH_STATE_FILE records the
+    same audio hash, image hash and encode settings it was built from.
+
+    Args:
+        episodes_dir: Folder holding the NNN-Title episode folders
+        workers: Parallel conversions (defaults to the number of CPU cores)
+        force: Rebuild every output regardless of the recorded state
+        stream: Build the <audio>-stream/ folders (convert_to_stream) instead of MP4 videos
+    """
+    jobs = find_episode_jobs(episodes_dir, stream)
+    if not jobs:
+        print(f"No episode folders with {'audio' if stream else 'audio and cover'} found in {episodes_dir}")
+        return False
+
+    manifest = {}
+    if os.path.exists(BATCH_STATE_FILE):
+        with open(BATCH_STATE_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    settings = {
+        'max_size_mb': max_size_mb,
+        'copy_audio': copy_audio,
+        'encoder_version': ENCODER_VERSION,
+    }
+    if stream:
+        settings['stream'] = {'fragment_seconds': STREAM_FRAGMENT_SECONDS,
+                              'segment_seconds': HLS_SEGMENT_SECONDS}
+
+    todo = {}
+    for audio_file, image_file, output_file in jobs:
+        key = os.path.relpath(output_file, REPO_ROOT).replace(os.sep, '/')
+        previous = manifest.get(key, {})
+        entry = {
+            'audio': file_fingerprint(audio_file, previous.get('audio')),
+            'settings': settings,
+        }
+        if image_file:
+            entry['image'] = file_fingerprint(image_file, previous.get('image'))
+
+        up_to_date = (
+            os.path.exists(output_file)
+            and previous.get('audio', {}).get('sha256') == entry['audio']['sha256']
+            and previous.get('image', {}).get('sha256') == entry.get('image', {}).get('sha256')
+            and previous.get('settings') == settings
+        )
+        if up_to_date and not force:
+            print(f"Up to date: {key}")
+            continue
+        todo[key] = (audio_file, image_file, output_file, entry)
+
+    if not todo:
+        print("\nAll outputs are up to date.")
+        return True
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo)))
+    # Split the cores between the parallel encoders instead of oversubscribing
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"\nConverting {len(todo)} episodes on {workers} workers ({threads} threads each)...\n")
+
+    def submit(pool, audio_file, image_file, output_file):
+        if stream:
+            return pool.submit(convert_to_stream, audio_file, output_file, max_size_mb, copy_audio,
+                               threads, stall_timeout, timing_log, False)
+        return pool.submit(convert_audio_to_mp4, audio_file, image_file, output_file,
+                           max_size_mb, copy_audio, threads, stall_timeout, timing_log, False)
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            submit(pool, audio_file, image_file, output_file): key
+            for key, (audio_file, image_file, output_file, _) in todo.items()
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                print(f"\nException converting {key}: {e}")
+                ok = False
+
+            if ok:
+                manifest[key] = todo[key][3]
+                # Save after each episode so an interrupted batch keeps its progress
+                os.makedirs(os.path.dirname(BATCH_STATE_FILE), exist_ok=True)
+                with open(BATCH_STATE_FILE, 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, indent=2, sort_keys=True)
+            else:
+                failed.append(key)
+
+    print()
+    print("=" * 60)
+    print(f"Batch complete: {len(todo) - len(failed)} converted, {len(jobs) - len(todo)} up to date")
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+    print("=" * 60)
+    return not failed
 
 
 if __name__ == "__main__":
+    if '--batch' in sys.argv:
+        parser = argparse.ArgumentParser(description="Convert every episode folder to MP4.")
+        parser.add_argument("--batch", nargs="?", const="episodes", dest="episodes_dir",
+                            help="episodes folder to scan (default: episodes)")
+        parser.add_argument("--stream", action="store_true",
+                            help="build fragmented MP4 + HLS folders instead of MP4 videos")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="parallel conversions (default: CPU cores)")
+        parser.add_argument("--force", action="store_true", help="rebuild even if up to date")
+        parser.add_argument("--max-size-mb", type=float, default=DEFAULT_MAX_SIZE_MB)
+        parser.add_argument("--reencode-audio", action="store_true")
+        parser.add_argument("--stall-timeout", type=float, default=DEFAULT_STALL_TIMEOUT)
+        parser.add_argument("--timing-log", default=None)
+        args = parser.parse_args()
+
+        success = convert_batch(args.episodes_dir, workers=args.workers,
+                                max_size_mb=args.max_size_mb,
+                                copy_audio=not args.reencode_audio, force=args.force,
+                                stall_timeout=args.stall_timeout,
+                                timing_log=args.timing_log, stream=args.stream)
+        sys.exit(0 if success else 1)
+
+    if '--stream' in sys.argv:
+        parser = argparse.ArgumentParser(description="Write fragmented MP4 and HLS segments for streaming.")
+        parser.add_argument("--stream", action="store_true", required=True)
+        parser.add_argument("audio_file")
+        parser.add_argument("output_dir", nargs="?", default=None,
+                            help="folder for the stream files (default: <audio>-stream)")
+        parser.add_argument("--max-size-mb", type=float, default=DEFAULT_MAX_SIZE_MB,
+                            help=f"size limit for each file (default {DEFAULT_MAX_SIZE_MB} MB)")
+        parser.add_argument("--reencode-audio", action="store_true",
+                            help="always re-encode audio to AAC instead of copying it")
+        parser.add_argument("--update-manifest", action="store_true",
+                            help="point the episode's file/stream in episodes.json at the output")
+        parser.add_argument("--stall-timeout", type=float, default=DEFAULT_STALL_TIMEOUT)
+        parser.add_argument("--timing-log", default=None)
+        args = parser.parse_args()
+
+        output_dir = args.output_dir or stream_output_dir(args.audio_file)
+        success = convert_to_stream(args.audio_file, output_dir,
+                                    max_size_mb=args.max_size_mb,
+                                    copy_audio=not args.reencode_audio,
+                                    stall_timeout=args.stall_timeout,
+                                    timing_log=args.timing_log)
+        if success and args.update_manifest:
+            number = point_manifest_at_stream(args.audio_file, output_dir)
+            if number is None:
+                print("No episode in episodes.json plays this file; manifest unchanged")
+            else:
+                print(f"Episode {number}: file and stream updated; run tools/build_site.py")
+        sys.exit(0 if success else 1)
+
     if len(sys.argv) < 3:
         print("Usage: python convert_to_mp4.py <audio_file> <image_file> [output_file]")
+        print("                                [--max-size-mb 95] [--reencode-audio]")
         print("\nExample:")
         print("  python convert_to_mp4.py episode.m4a cover.jpg")
         print("  python convert_to_mp4.py episode.m4a cover.jpg Episode-001.mp4")
+        print("  python convert_to_mp4.py episode.m4a cover.jpg --max-size-mb 80")
+        print("  python convert_to_mp4.py --batch episodes")
+        print("  python convert_to_mp4.py --stream episode.m4a --update-manifest")
         sys.exit(1)
 
-    audio = sys.argv[1]
-    image = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) > 3 else None
+    parser = argparse.ArgumentParser(description="Convert audio file to MP4 video with static image.")
+    parser.add_argument("audio_file")
+    parser.add_argument("image_file")
+    parser.add_argument("output_file", nargs="?", default=None)
+    parser.add_argument("--max-size-mb", type=float, default=DEFAULT_MAX_SIZE_MB,
+                        help=f"size budget for the output (default {DEFAULT_MAX_SIZE_MB} MB)")
+    parser.add_argument("--reencode-audio", action="store_true",
+                        help="always re-encode audio to AAC instead of copying it")
+    parser.add_argument("--stall-timeout", type=float, default=DEFAULT_STALL_TIMEOUT,
+                        help=f"kill ffmpeg after this many seconds without progress (default {DEFAULT_STALL_TIMEOUT})")
+    parser.add_argument("--timing-log", default=None,
+                        help="append a JSON timing record per encode to this file")
+    args = parser.parse_args()
 
-    success = convert_audio_to_mp4(audio, image, output)
+    success = convert_audio_to_mp4(args.audio_file, args.image_file, args.output_file,
+                                   max_size_mb=args.max_size_mb,
+                                   copy_audio=not args.reencode_audio,
+                                   stall_timeout=args.stall_timeout,
+                                   timing_log=args.timing_log)
     sys.exit(0 if success else 1)
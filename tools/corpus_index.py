@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Corpus-wide inverted index over every episode transcript, for TF-IDF ranking.
+Usage: python corpus_index.py [--rebuild] [--top N] [transcript_file]
+
+Indexes episodes/*/episode-*-transcript.txt and archive/transcripts/*.txt.
+The index is stored in tools/.cache/corpus-index.json and updated
+incrementally: only transcripts whose content hash changed are re-read, and
+their old postings are swapped out for new ones. generate_title.py and
+generate_cover_prompt.py use it to rank terms that are distinctive for an
+episode instead of words every episode repeats.
+
+With a transcript file, prints that transcript's most distinctive terms.
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+from collections import Counter
+
+from transcript_index import TranscriptIndex, text_hash
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INDEX_FILE = os.path.join(REPO_ROOT, 'tools', '.cache', 'corpus-index.json')
+
+TRANSCRIPT_GLOBS = [
+    os.path.join('episodes', '*', 'episode-*-transcript.txt'),
+    os.path.join('archive', 'transcripts', '*.txt'),
+]
+
+# Bump when the stored format or the terms indexed per document change
+CORPUS_VERSION = 2
+
+# Phrases up to this many tokens get their own postings ('trap house')
+MAX_TERM_TOKENS = 2
+
+
+class CorpusIndex:
+    """
+    Inverted index: term -> {doc_id: count}, plus per-document hash and length.
+
+    Document frequency of a term is the size of its posting dict. The
+    reverse maps (doc_id -> terms, content hash -> doc_id) are rebuilt on
+    load rather than stored, so re-indexing or looking up one transcript
+    only touches that transcript's own terms.
+    """
+
+    def __init__(self, postings=None, docs=None):
+        self.postings = postings or {}
+        self.docs = docs or {}
+        self.doc_terms = {doc_id: [] for doc_id in self.docs}
+        for term, postings in self.postings.items():
+            for doc_id in postings:
+                self.doc_terms.setdefault(doc_id, []).append(term)
+        self.doc_ids = {}
+        for doc_id, info in self.docs.items():
+            self.doc_ids.setdefault(info['hash'], doc_id)
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_FILE):
+        """Load a stored index, or an empty one if missing or outdated."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if data.get('version') != CORPUS_VERSION:
+            return cls()
+        return cls(data['postings'], data['docs'])
+
+    def save(self, path=DEFAULT_INDEX_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': CORPUS_VERSION, 'docs': self.docs, 'postings': self.postings}, f)
+        os.replace(tmp, path)
+
+    @property
+    def doc_count(self):
+        return len(self.docs)
+
+    def add_document(self, doc_id, text):
+        """Index (or re-index) one transcript."""
+        self.remove_document(doc_id)
+
+        index = TranscriptIndex.for_text(text)
+        terms = document_terms(index)
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+        self.doc_terms[doc_id] = list(terms)
+        self.docs[doc_id] = {'hash': index.text_hash, 'length': len(index.tokens)}
+        self.doc_ids.setdefault(index.text_hash, doc_id)
+
+    def remove_document(self, doc_id):
+        """Drop a transcript's postings."""
+        if doc_id not in self.docs:
+            return
+        for term in self.doc_terms.pop(doc_id, ()):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        digest = self.docs.pop(doc_id)['hash']
+        if self.doc_ids.get(digest) == doc_id:
+            del self.doc_ids[digest]
+            # Another transcript with the same text takes over the hash
+            for other, info in self.docs.items():
+                if info['hash'] == digest:
+                    self.doc_ids[digest] = other
+                    break
+
+    def terms_of(self, doc_id):
+        return self.doc_terms.get(doc_id, [])
+
+    def update(self, root=REPO_ROOT, paths=None):
+        """
+        Bring the index in line with the transcripts on disk.
+
+        Unchanged transcripts (same content hash) are skipped, new or edited
+        ones re-indexed, and deleted ones removed.
+
+        Returns (added_or_changed, removed) lists of doc ids.
+        """
+        if paths is None:
+            paths = find_transcripts(root)
+
+        seen = set()
+        changed = []
+        for path in paths:
+            doc_id = os.path.relpath(path, root).replace(os.sep, '/')
+            seen.add(doc_id)
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            if self.docs.get(doc_id, {}).get('hash') == text_hash(text):
+                continue
+            self.add_document(doc_id, text)
+            changed.append(doc_id)
+
+        removed = [doc_id for doc_id in self.docs if doc_id not in seen]
+        for doc_id in removed:
+            self.remove_document(doc_id)
+
+        return changed, removed
+
+    def document_frequency(self, term):
+        return len(self.postings.get(term, ()))
+
+    def idf(self, term, exclude=None):
+        """
+        Smoothed inverse document frequency; close to 0 for words every
+        transcript uses.
+
+        Pass exclude=doc_id when scoring a transcript that is itself in the
+        corpus, so it doesn't count towards its own terms' frequency.
+        """
+        n = self.doc_count
+        df = self.document_frequency(term)
+        if exclude and exclude in self.postings.get(term, ()):
+            n -= 1
+            df -= 1
+        return math.log((1 + n) / (1 + df))
+
+    def weight(self, term, count, exclude=None):
+        """TF-IDF weight of a term seen `count` times in one transcript."""
+        return count * self.idf(term, exclude)
+
+    def doc_id_for(self, text):
+        """The id of the indexed transcript with exactly this text, if any."""
+        return self.doc_ids.get(text_hash(text))
+
+    def distinctive_terms(self, text, top=20, min_length=3):
+        """Terms of `text` ranked by TF-IDF against the rest of the corpus."""
+        index = TranscriptIndex.for_text(text)
+        exclude = self.doc_id_for(text)
+        scored = [
+            (term, self.weight(term, count, exclude))
+            for term, count in document_terms(index).items()
+            if len(term) >= min_length and any(c.isalpha() for c in term)
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:top]
+
+
+def document_terms(index):
+    """Counts of every indexed term (single words and short phrases) in a transcript."""
+    terms = Counter()
+    for n in range(1, MAX_TERM_TOKENS + 1):
+        terms.update(index.ngrams[n])
+    return terms
+
+def find_transcripts(root=REPO_ROOT):
+    paths = []
+    for pattern in TRANSCRIPT_GLOBS:
+        paths.extend(sorted(glob.glob(os.path.join(root, pattern))))
+    return paths
+
+def load_corpus(path=DEFAULT_INDEX_FILE, root=REPO_ROOT):
+    """Load the stored corpus index, bring it up to date, and save it if anything changed."""
+    corpus = CorpusIndex.load(path)
+    changed, removed = corpus.update(root)
+    if changed or removed:
+        try:
+            corpus.save(path)
+        except OSError:
+            pass
+    return corpus
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the corpus index used for TF-IDF ranking.")
+    parser.add_argument("transcript_file", nargs="?", help="print this transcript's most distinctive terms")
+    parser.add_argument("--rebuild", action="store_true", help="discard the stored index and index everything again")
+    parser.add_argument("--top", type=int, default=20, help="distinctive terms to print (default 20)")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(DEFAULT_INDEX_FILE):
+        os.remove(DEFAULT_INDEX_FILE)
+
+    corpus = CorpusIndex.load()
+    changed, removed = corpus.update()
+    corpus.save()
+    print(f"Corpus: {corpus.doc_count} transcripts, {len(corpus.postings)} terms")
+    print(f"Updated: {len(changed)} re-indexed, {len(removed)} removed")
+
+    if args.transcript_file:
+        try:
+            with open(args.transcript_file, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except OSError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print()
+        print(f"Most distinctive terms in {args.transcript_file}:")
+        for term, score in corpus.distinctive_terms(text, args.top):
+            print(f"  {score:8.2f}  {term}")
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Generate resized cover-art copies for the site and the podcast feed.
+Usage: python cover_derivatives.py [--workers N] [--force]
+
+Every cover image under episodes/*/ and archive/ gets:
+  thumb, thumb_webp     300x300 (episode list)
+  player, player_webp   800x800 (now-playing artwork)
+  feed                  3000x3000 JPEG (Apple/Spotify feed artwork)
+
+Derivatives are written to covers/ under content-addressed names: a hash of
+the source image and the recipe that produced them. An unchanged source is
+skipped, and a changed image or recipe gets new names, so browsers and feed
+readers never serve a stale cached copy. Derivatives no source refers to any
+more are deleted.
+
+The mapping from original path to derivatives is written twice:
+  covers/covers.json   for the build tools (feed artwork, site build)
+  covers/covers.js     loaded by index.html, which swaps originals for the
+                       small versions (WebP where the browser supports it)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+from media_common import FFMPEG_BINARY, file_fingerprint
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COVERS_DIR = os.path.join(REPO_ROOT, 'covers')
+MAPPING_JSON = os.path.join(COVERS_DIR, 'covers.json')
+MAPPING_JS = os.path.join(COVERS_DIR, 'covers.js')
+
+SOURCE_GLOBS = [
+    os.path.join('episodes', '*', '*.jpg'),
+    os.path.join('episodes', '*', '*.png'),
+    os.path.join('archive', '*.jpg'),
+    os.path.join('archive', '*.png'),
+]
+
+# name -> (square size in pixels, format, quality)
+# libwebp quality is 0-100 (higher is better); mjpeg -q:v is 2-31 (lower is better)
+DERIVATIVES = {
+    'thumb': (300, 'jpg', 4),
+    'thumb_webp': (300, 'webp', 80),
+    'player': (800, 'jpg', 3),
+    'player_webp': (800, 'webp', 82),
+    'feed': (3000, 'jpg', 4),
+}
+
+# Bump when the ffmpeg command changes in a way that alters the output
+RECIPE_VERSION = 1
+
+
+def find_sources(root=REPO_ROOT):
+    """Repo-relative paths (forward slashes) of every cover image."""
+    paths = []
+    for pattern in SOURCE_GLOBS:
+        paths.extend(sorted(glob.glob(os.path.join(root, pattern))))
+    return [os.path.relpath(path, root).replace(os.sep, '/') for path in paths]
+
+def derivative_name(source_sha256, name):
+    """Content-addressed file name for one derivative of one source."""
+    size, fmt, quality = DERIVATIVES[name]
+    recipe = f"{source_sha256}|{name}|{size}|{fmt}|{quality}|{RECIPE_VERSION}"
+    digest = hashlib.sha256(recipe.encode('utf-8')).hexdigest()[:16]
+    return f"{digest}-{name}.{fmt}"
+
+def render(source_file, output_file, name):
+    """
+    Scale and center-crop source_file to a square derivative with ffmpeg.
+
+    Written to a temporary name first so an interrupted run never leaves a
+    truncated image under a content-addressed name. Returns an error string,
+    or None on success.
+    """
+    size, fmt, quality = DERIVATIVES[name]
+    if fmt == 'webp':
+        codec = ['-c:v', 'libwebp', '-quality', str(quality)]
+    else:
+        codec = ['-q:v', str(quality), '-pix_fmt', 'yuvj420p']
+
+    tmp_file = os.path.join(os.path.dirname(output_file), '.tmp-' + os.path.basename(output_file))
+    cmd = [
+        FFMPEG_BINARY, '-y', '-v', 'error',
+        '-i', source_file,
+        '-vf', f'scale={size}:{size}:force_original_aspect_ratio=increase:flags=lanczos,crop={size}:{size}',
+        '-frames:v', '1',
+        *codec,
+        tmp_file,
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError as e:
+        return str(e)
+    if result.returncode != 0 or not os.path.exists(tmp_file):
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        return result.stderr.strip() or f"ffmpeg exited with {result.returncode}"
+    os.replace(tmp_file, output_file)
+    return None
+
+def load_mapping(path=MAPPING_JSON):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def write_mapping(mapping):
+    """Write covers.json, and covers.js (the same data as window.COVER_DERIVATIVES)."""
+    site_mapping = {
+        source: {name: 'covers/' + entry['derivatives'][name] for name in DERIVATIVES}
+        for source, entry in mapping.items()
+    }
+    for path, content in (
+        (MAPPING_JSON, json.dumps(mapping, indent=2, sort_keys=True)),
+        (MAPPING_JS, "// Generated by tools/cover_derivatives.py - do not edit\n"
+                     f"window.COVER_DERIVATIVES = {json.dumps(site_mapping, indent=2, sort_keys=True)};\n"),
+    ):
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+def build_covers(root=REPO_ROOT, workers=None, force=False):
+    """
+    Bring covers/ up to date with every source image.
+
+    Returns True if every derivative was produced.
+    """
+    os.makedirs(COVERS_DIR, exist_ok=True)
+    previous = load_mapping()
+    mapping = {}
+    jobs = []
+
+    for source in find_sources(root):
+        fingerprint = file_fingerprint(os.path.join(root, source), previous.get(source, {}).get('source'))
+        derivatives = {name: derivative_name(fingerprint['sha256'], name) for name in DERIVATIVES}
+        mapping[source] = {'source': fingerprint, 'derivatives': derivatives}
+
+        missing = [name for name, file_name in derivatives.items()
+                   if force or not os.path.exists(os.path.join(COVERS_DIR, file_name))]
+        if missing:
+            jobs.extend((source, name, derivatives[name]) for name in missing)
+        else:
+            print(f"Up to date: {source}")
+
+    failed = set()
+    if jobs:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+        print(f"\nRendering {len(jobs)} derivatives on {workers} workers...")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            errors = pool.map(lambda job: render(os.path.join(root, job[0]),
+                                                 os.path.join(COVERS_DIR, job[2]), job[1]), jobs)
+            for (source, name, file_name), error in zip(jobs, errors):
+                if error:
+                    print(f"  FAILED {source} -> {name}: {error}")
+                    failed.add(source)
+                else:
+                    print(f"  {source} -> covers/{file_name}")
+
+    # A source with a failed derivative keeps its previous entry (if any) so the site stays intact
+    for source in failed:
+        if source in previous:
+            mapping[source] = previous[source]
+        else:
+            del mapping[source]
+
+    # Remove derivatives nothing refers to any more (old versions of edited covers)
+    referenced = {file_name for entry in mapping.values() for file_name in entry['derivatives'].values()}
+    removed = 0
+    for name in os.listdir(COVERS_DIR):
+        if name not in referenced and name not in (os.path.basename(MAPPING_JSON), os.path.basename(MAPPING_JS)):
+            os.remove(os.path.join(COVERS_DIR, name))
+            removed += 1
+
+    write_mapping(mapping)
+
+    original = sum(entry['source']['size'] for entry in mapping.values())
+    thumbs = sum(os.path.getsize(os.path.join(COVERS_DIR, entry['derivatives']['thumb_webp']))
+                 for entry in mapping.values())
+    print()
+    print("=" * 60)
+    print(f"Covers: {len(mapping)} sources, {len(jobs)} rendered, {removed} stale files removed")
+    print(f"Originals {original / 1024 / 1024:.1f} MB -> WebP thumbnails {thumbs / 1024:.0f} KB")
+    if failed:
+        print(f"Failed: {', '.join(sorted(failed))}")
+    print(f"Mapping: {os.path.relpath(MAPPING_JSON, root)}, {os.path.relpath(MAPPING_JS, root)}")
+    print("=" * 60)
+    return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate resized cover-art copies for the site and feed.")
+    parser.add_argument("--workers", type=int, default=None, help="parallel ffmpeg runs (default: CPU cores)")
+    parser.add_argument("--force", action="store_true", help="re-render every derivative")
+    args = parser.parse_args()
+
+    success = build_covers(workers=args.workers, force=args.force)
+    sys.exit(0 if success else 1)
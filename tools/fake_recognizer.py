@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Google speech-api v2 recognizer.
+Usage: python fake_recognizer.py [--port 8765] [--latency 0.5] [--error-rate 0.1] [--rate-limit 5]
+
+Accepts the same POST requests HttpBackend sends (raw 16 kHz mono PCM) and
+answers in Google's response format after a configurable delay, so the
+transcription pipeline and its throughput can be exercised offline. It can
+also answer 429 Too Many Requests at random (--error-rate) or whenever
+clients exceed a request rate (--rate-limit), to test the client's backoff:
+
+  python fake_recognizer.py --latency 1.0
+  python transcribe_audio.py episode.m4a --backend http --url http://127.0.0.1:8765/recognize
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BYTES_PER_SECOND = 16000 * 2
+
+
+class FakeRecognizerHandler(BaseHTTPRequestHandler):
+    """Answers every recognition request with a canned transcript."""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.5
+    jitter = 0.0
+    error_rate = 0.0
+    limiter = None
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        audio = self.rfile.read(length)
+
+        if random.random() < self.error_rate or (self.limiter and not self.limiter.allow()):
+            self.send_too_many_requests()
+            return
+
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+        seconds = len(audio) / BYTES_PER_SECOND
+        result = {
+            "result": [{
+                "alternative": [{"transcript": f"segment of {seconds:.2f} seconds", "confidence": 0.9}],
+                "final": True,
+            }],
+            "result_index": 0,
+        }
+        # Google sends an empty result line before the real one
+        body = (json.dumps({"result": []}) + "\n" + json.dumps(result) + "\n").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_too_many_requests(self):
+        body = b"Too many requests"
+        self.send_response(429)
+        self.send_header("Retry-After", "1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RateLimiter:
+    """Server-side limit: allows `rate` requests per rolling second."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.times = []
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            now = time.monotonic()
+            self.times = [t for t in self.times if now - t < 1.0]
+            if len(self.times) >= self.rate:
+                return False
+            self.times.append(now)
+            return True
+
+
+def make_server(port=8765, latency=0.5, jitter=0.0, error_rate=0.0, rate_limit=None):
+    """Create (but don't start) a fake recognizer server on localhost."""
+    handler = type("Handler", (FakeRecognizerHandler,), {
+        "latency": latency,
+        "jitter": jitter,
+        "error_rate": error_rate,
+        "limiter": RateLimiter(rate_limit) if rate_limit else None,
+    })
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Google speech recognizer.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per request (default 0.5)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- seconds added to latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--rate-limit", type=float, default=None, help="requests per second before answering 429")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency, args.jitter, args.error_rate, args.rate_limit)
+    print(f"Fake recognizer listening on http://127.0.0.1:{args.port}/recognize")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
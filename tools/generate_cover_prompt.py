@@ -9,66 +9,86 @@ for creating episode cover art.
 
 import sys
 import os
-import re
-
-def extract_key_themes(text):
-    """Extract key themes and imagery from transcript text."""
-
-    # Common powerful visual themes to look for
-    theme_keywords = {
-        'surveillance': ['spy', 'surveillance', 'watching', 'camera', 'monitor', 'tracking', 'hack', 'digital'],
-        'danger': ['murder', 'kill', 'death', 'threat', 'danger', 'weapon', 'gun', 'knife'],
-        'drugs': ['fentanyl', 'cocaine', 'meth', 'drugs', 'overdose', 'cartel', 'dealer'],
-        'technology': ['ai', 'algorithm', 'computer', 'phone', 'digital', 'cyber', 'hack', 'code'],
-        'conspiracy': ['federal', 'government', 'cia', 'fbi', 'dea', 'agent', 'undercover', 'secret'],
-        'urban': ['street', 'city', 'neighborhood', 'trap house', 'hotel', 'alley'],
-        'darkness': ['shadow', 'dark', 'night', 'hidden', 'underground', 'bunker'],
-        'chaos': ['chaos', 'paranoia', 'addiction', 'relapse', 'breakdown', 'spiral'],
-        'justice': ['justice', 'investigation', 'evidence', 'witness', 'informant', 'truth']
-    }
-
-    text_lower = text.lower()
+from transcript_index import TranscriptIndex
+from corpus_index import load_corpus
+
+# Common powerful visual themes to look for
+THEME_KEYWORDS = {
+    'surveillance': ['spy', 'surveillance', 'watching', 'camera', 'monitor', 'tracking', 'hack', 'digital'],
+    'danger': ['murder', 'kill', 'death', 'threat', 'danger', 'weapon', 'gun', 'knife'],
+    'drugs': ['fentanyl', 'cocaine', 'meth', 'drugs', 'overdose', 'cartel', 'dealer'],
+    'technology': ['ai', 'algorithm', 'computer', 'phone', 'digital', 'cyber', 'hack', 'code'],
+    'conspiracy': ['federal', 'government', 'cia', 'fbi', 'dea', 'agent', 'undercover', 'secret'],
+    'urban': ['street', 'city', 'neighborhood', 'trap house', 'hotel', 'alley'],
+    'darkness': ['shadow', 'dark', 'night', 'hidden', 'underground', 'bunker'],
+    'chaos': ['chaos', 'paranoia', 'addiction', 'relapse', 'breakdown', 'spiral'],
+    'justice': ['justice', 'investigation', 'evidence', 'witness', 'informant', 'truth']
+}
+
+# Specific visual elements, grouped by what they depict
+VISUAL_WORDS = [
+    ['phone', 'iphone', 'computer', 'laptop', 'screen'],
+    ['gun', 'weapon', 'knife'],
+    ['car', 'vehicle', 'van'],
+    ['house', 'apartment', 'hotel', 'building'],
+    ['street', 'alley', 'corner'],
+    ['camera', 'satellite', 'drone'],
+    ['money', 'cash', 'dollars'],
+    ['pills', 'powder', 'needle'],
+    ['badge', 'agent', 'officer'],
+    ['shadow', 'silhouette', 'figure'],
+]
+
+def rank_by_corpus(text, index, corpus, words):
+    """Sort words by TF-IDF in this transcript against the rest of the corpus."""
+    exclude = corpus.doc_id_for(text)
+    return sorted(words, key=lambda word: corpus.weight(word, index.count(word), exclude), reverse=True)
+
+def extract_key_themes(text, index=None, corpus=None):
+    """
+    Extract key themes and imagery from transcript text.
+
+    With a CorpusIndex, themes are ordered by how distinctive their keywords
+    are for this episode (summed TF-IDF), most distinctive first.
+    """
+    index = index or TranscriptIndex.for_text(text)
     found_themes = []
+    scores = {}
 
-    for theme, keywords in theme_keywords.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                found_themes.append(theme)
-                break
+    for theme, keywords in THEME_KEYWORDS.items():
+        present = [keyword for keyword in keywords if index.contains(keyword)]
+        if present:
+            found_themes.append(theme)
+            if corpus is not None:
+                exclude = corpus.doc_id_for(text)
+                scores[theme] = sum(corpus.weight(k, index.count(k), exclude) for k in present)
 
-    return list(set(found_themes))
+    if corpus is not None:
+        found_themes.sort(key=lambda theme: scores[theme], reverse=True)
 
-def extract_specific_imagery(text):
-    """Extract specific nouns and imagery from the text."""
+    return found_themes
+
+def extract_specific_imagery(text, index=None, corpus=None):
+    """Extract specific nouns and imagery from the text (most distinctive first with a corpus)."""
+    index = index or TranscriptIndex.for_text(text)
 
     # Look for specific visual elements mentioned
     visual_elements = []
+    for group in VISUAL_WORDS:
+        visual_elements.extend(word for word in group if index.contains(word))
 
-    patterns = [
-        r'\b(phone|iphone|computer|laptop|screen)\b',
-        r'\b(gun|weapon|knife)\b',
-        r'\b(car|vehicle|van)\b',
-        r'\b(house|apartment|hotel|building)\b',
-        r'\b(street|alley|corner)\b',
-        r'\b(camera|satellite|drone)\b',
-        r'\b(money|cash|dollars)\b',
-        r'\b(pills|powder|needle)\b',
-        r'\b(badge|agent|officer)\b',
-        r'\b(shadow|silhouette|figure)\b',
-    ]
-
-    text_lower = text.lower()
-    for pattern in patterns:
-        matches = re.findall(pattern, text_lower)
-        visual_elements.extend(matches)
+    if corpus is not None:
+        visual_elements = rank_by_corpus(text, index, corpus, visual_elements)
 
-    return list(set(visual_elements))
+    return visual_elements
 
-def generate_prompt(transcript_text, episode_number=None):
+def generate_prompt(transcript_text, episode_number=None, corpus=None, index=None):
     """Generate a Gemini image prompt from transcript analysis."""
 
-    themes = extract_key_themes(transcript_text)
-    visuals = extract_specific_imagery(transcript_text)
+    # Tokenize once (or load from cache) and serve every extractor from it
+    index = index or TranscriptIndex.for_text(transcript_text)
+    themes = extract_key_themes(transcript_text, index, corpus)
+    visuals = extract_specific_imagery(transcript_text, index, corpus)
 
     # Base style for the podcast
     style_elements = [
@@ -125,6 +145,17 @@ def generate_prompt(transcript_text, episode_number=None):
 
     return full_prompt, themes, visuals
 
+def save_prompt(prompt, themes, visuals, episode_num, output_file=None):
+    """Write the prompt with its detected themes; returns the file written."""
+    output_file = output_file or f"cover-prompt-{episode_num}.txt"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(f"Episode {episode_num} Cover Art Prompt\n")
+        f.write(f"Detected Themes: {', '.join(themes)}\n")
+        f.write(f"Visual Elements: {', '.join(visuals)}\n\n")
+        f.write("PROMPT:\n")
+        f.write(prompt)
+    return output_file
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: python generate_cover_prompt.py <transcript_file> [episode_number]")
@@ -144,7 +175,14 @@ def main():
         transcript_text = f.read()
 
     # Generate prompt
-    prompt, themes, visuals = generate_prompt(transcript_text, episode_num)
+    # Rank imagery against every other episode; fall back to raw counts without it
+    try:
+        corpus = load_corpus()
+    except OSError as e:
+        print(f"Warning: corpus index unavailable ({e}), using raw counts")
+        corpus = None
+
+    prompt, themes, visuals = generate_prompt(transcript_text, episode_num, corpus)
 
     # Output
     print("=" * 70)
@@ -163,13 +201,7 @@ def main():
     print("=" * 70)
 
     # Also save to file
-    output_file = f"cover-prompt-{episode_num}.txt"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(f"Episode {episode_num} Cover Art Prompt\n")
-        f.write(f"Detected Themes: {', '.join(themes)}\n")
-        f.write(f"Visual Elements: {', '.join(visuals)}\n\n")
-        f.write("PROMPT:\n")
-        f.write(prompt)
+    output_file = save_prompt(prompt, themes, visuals, episode_num)
 
     print(f"Prompt also saved to: {output_file}")
 
@@ -10,7 +10,8 @@ in the Undercover Fallout style.
 import sys
 import os
 import re
-from collections import Counter
+from transcript_index import TranscriptIndex
+from corpus_index import load_corpus
 
 # Power words that make titles pop
 POWER_WORDS = {
@@ -24,6 +25,13 @@ POWER_WORDS = {
     'people': ['ms-13', 'ghost', 'shadow', 'snitch', 'handler', 'asset', 'target'],
 }
 
+# Token shapes used by extract_numbers()
+NUMBER_TOKEN = re.compile(r'\d+(?:,\d{3})*(?:\.\d+)?')
+INTEGER_TOKEN = re.compile(r'\d+')
+MONEY_UNITS = {'dollars', 'thousand', 'million', 'k'}
+TIME_UNITS = {'day', 'days', 'hour', 'hours', 'year', 'years', 'month', 'months',
+              'week', 'weeks', 'minute', 'minutes'}
+
 # Title templates for edgy combinations
 TITLE_TEMPLATES = [
     "{noun1}, {noun2}, and {noun3}",
@@ -38,56 +46,68 @@ TITLE_TEMPLATES = [
     "The {noun1} Protocol",
 ]
 
-def extract_key_terms(text):
-    """Extract the most compelling terms from transcript."""
-    text_lower = text.lower()
+def extract_key_terms(text, index=None, corpus=None):
+    """
+    Extract the most compelling terms from transcript.
+
+    With a CorpusIndex, terms are ranked by TF-IDF against the other episodes
+    instead of raw count, so words every episode uses sink to the bottom.
+    """
+    index = index or TranscriptIndex.for_text(text)
 
     found_terms = {category: [] for category in POWER_WORDS}
 
+    # Whole-token counts straight from the index ('ai' no longer hits 'said')
     for category, words in POWER_WORDS.items():
         for word in words:
-            if word in text_lower:
-                # Count occurrences
-                count = text_lower.count(word)
+            count = index.count(word)
+            if count:
                 found_terms[category].append((word, count))
 
-    # Sort by frequency
+    # Sort by frequency, or by distinctiveness when a corpus is available
+    if corpus is not None:
+        exclude = corpus.doc_id_for(text)
+        rank = lambda x: corpus.weight(x[0], x[1], exclude)
+    else:
+        rank = lambda x: x[1]
     for category in found_terms:
-        found_terms[category].sort(key=lambda x: x[1], reverse=True)
+        found_terms[category].sort(key=rank, reverse=True)
 
     return found_terms
 
-def extract_numbers(text):
+def extract_numbers(text, index=None):
     """Find compelling numbers mentioned."""
-    # Look for dollar amounts
-    dollars = re.findall(r'\$[\d,]+(?:\.\d{2})?|\d+(?:,\d{3})*\s*(?:dollars|thousand|million|k\b)', text.lower())
+    index = index or TranscriptIndex.for_text(text)
+    tokens, offsets = index.tokens, index.offsets
+
+    # Look for dollar amounts: "$75,000" or "75,000 dollars" / "5 million" / "5k"
+    dollars = []
+    for i in range(len(tokens) - 1):
+        token, following = tokens[i], tokens[i + 1]
+        if token == '$' and NUMBER_TOKEN.fullmatch(following) and offsets[i + 1] == offsets[i] + 1:
+            dollars.append('$' + following)
+        elif NUMBER_TOKEN.fullmatch(token) and following in MONEY_UNITS:
+            dollars.append(token + ('' if following == 'k' else ' ') + following)
 
     # Look for other significant numbers
-    numbers = re.findall(r'\b(\d+)\s*(days?|hours?|years?|months?|weeks?|minutes?)\b', text.lower())
+    numbers = [(tokens[i], unit) for i, unit in index.followed_by(INTEGER_TOKEN, TIME_UNITS)]
 
     return dollars, numbers
 
-def extract_specific_nouns(text):
+def extract_specific_nouns(text, index=None):
     """Extract specific nouns that would make good title elements."""
-    specific_patterns = [
-        r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\b',  # Proper nouns
-        r'\b(iPhone|Android|WhatsApp|Signal|Telegram)\b',  # Tech products
-        r'\b(MS-13|Sinaloa|cartel)\b',  # Organizations
-    ]
-
-    nouns = []
-    for pattern in specific_patterns:
-        matches = re.findall(pattern, text)
-        nouns.extend(matches)
+    index = index or TranscriptIndex.for_text(text)
 
-    return list(set(nouns))[:10]
+    # Proper nouns, tech products and organizations, in order of first mention
+    return index.proper_nouns[:10]
 
-def generate_titles(transcript_text, episode_num="XXX"):
-    """Generate multiple edgy title options."""
+def generate_titles(transcript_text, episode_num="XXX", corpus=None, index=None):
+    """Generate multiple edgy title options (ranked by TF-IDF if a corpus is given)."""
 
-    terms = extract_key_terms(transcript_text)
-    dollars, time_refs = extract_numbers(transcript_text)
-    specific_nouns = extract_specific_nouns(transcript_text)
+    # Tokenize once (or load from cache) and serve every extractor from it
+    index = index or TranscriptIndex.for_text(transcript_text)
+    terms = extract_key_terms(transcript_text, index, corpus)
+    dollars, time_refs = extract_numbers(transcript_text, index)
 
     titles = []
 
@@ -172,6 +192,17 @@ def title_to_filename(title, episode_num):
     clean = re.sub(r'\s+', '-', clean.strip())
     return f"Episode-{episode_num}-{clean}"
 
+def save_title_options(titles, episode_num, output_file=None):
+    """Write the numbered title list with filenames; returns the file written."""
+    output_file = output_file or f"title-options-{episode_num}.txt"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(f"Episode {episode_num} Title Options\n\n")
+        for i, title in enumerate(titles, 1):
+            filename = title_to_filename(title, episode_num)
+            f.write(f"{i}. {title}\n")
+            f.write(f"   Filename: {filename}.mp4\n\n")
+    return output_file
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: python generate_title.py <transcript_file> [episode_number]")
@@ -191,7 +222,14 @@ def main():
         transcript_text = f.read()
 
     # Generate titles
-    titles, key_terms = generate_titles(transcript_text, episode_num)
+    # Rank terms against every other episode; fall back to raw counts without it
+    try:
+        corpus = load_corpus()
+    except OSError as e:
+        print(f"Warning: corpus index unavailable ({e}), ranking by raw counts")
+        corpus = None
+
+    titles, key_terms = generate_titles(transcript_text, episode_num, corpus)
 
     # Output
     print("=" * 70)
@@ -219,13 +257,7 @@ def main():
     print("=" * 70)
 
     # Save to file
-    output_file = f"title-options-{episode_num}.txt"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write(f"Episode {episode_num} Title Options\n\n")
-        for i, title in enumerate(titles, 1):
-            filename = title_to_filename(title, episode_num)
-            f.write(f"{i}. {title}\n")
-            f.write(f"   Filename: {filename}.mp4\n\n")
+    output_file = save_title_options(titles, episode_num)
 
     print(f"Options saved to: {output_file}")
 
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Title and cover-prompt analysis that runs while a transcript is being produced.
+Usage: python transcribe_audio.py <audio_file> --analyze [episode_number]
+
+LiveAnalyzer takes transcript segments in order as the recognizer returns
+them and keeps term counts, n-grams and names up to date (see
+IncrementalIndex), so provisional titles, themes and a cover prompt can be
+printed at any point. When transcription finishes, the title options and
+cover prompt files are written straight away instead of waiting for a
+separate generate_title.py / generate_cover_prompt.py run.
+
+It can also replay an existing transcript line by line, to see how early
+the results settle:
+
+  python live_analysis.py episode-010-transcript.txt 010 --every 20
+"""
+
+import argparse
+import os
+import sys
+
+from corpus_index import load_corpus
+from generate_cover_prompt import generate_prompt, save_prompt
+from generate_title import generate_titles, save_title_options
+from transcript_index import IncrementalIndex
+
+# Print provisional results after this many segments (0 = only at the end)
+DEFAULT_REPORT_EVERY = 10
+
+
+class LiveAnalyzer:
+    """
+    Incremental title/theme analysis over a transcript that is still growing.
+
+    Feed it segments with add_segment() (it is also a plain callable, so it
+    can be passed as transcribe_audio's on_text hook) and read results with
+    provisional() at any time.
+    """
+
+    def __init__(self, episode_num="XXX", corpus=None, report_every=DEFAULT_REPORT_EVERY):
+        self.episode_num = episode_num
+        self.corpus = corpus
+        self.report_every = report_every
+        self.builder = IncrementalIndex()
+
+    @property
+    def segment_count(self):
+        return len(self.builder.segments)
+
+    def add_segment(self, text):
+        """Add the next transcript segment (in transcript order)."""
+        self.builder.add(text)
+        if self.report_every and self.segment_count % self.report_every == 0:
+            self.print_provisional()
+
+    __call__ = add_segment
+
+    def provisional(self):
+        """Titles, key terms, cover prompt, themes and visuals for the text so far."""
+        text = self.builder.text()
+        index = self.builder.index()
+        titles, key_terms = generate_titles(text, self.episode_num, self.corpus, index)
+        prompt, themes, visuals = generate_prompt(text, self.episode_num, self.corpus, index)
+        return {
+            'segments': self.segment_count,
+            'words': len(index.tokens),
+            'titles': titles,
+            'key_terms': key_terms,
+            'cover_prompt': prompt,
+            'themes': themes,
+            'visuals': visuals,
+        }
+
+    def print_provisional(self):
+        result = self.provisional()
+        print(f"  [analysis after {result['segments']} segments, {result['words']} words] "
+              f"themes: {', '.join(result['themes']) or 'none yet'}")
+        if result['titles']:
+            print(f"    leading title: {result['titles'][0]}")
+
+    def finish(self, title_file=None, prompt_file=None):
+        """
+        Final results for the complete transcript: writes the title options and
+        cover prompt files, and keeps the index for the rest of the run. Returns the result dict.
+        """
+        result = self.provisional()
+        self.builder.index().remember()
+
+        title_file = save_title_options(result['titles'], self.episode_num, title_file)
+        prompt_file = save_prompt(result['cover_prompt'], result['themes'], result['visuals'],
+                                  self.episode_num, prompt_file)
+
+        print(f"Title options saved to: {title_file}")
+        print(f"Cover prompt saved to: {prompt_file}")
+        return result
+
+
+def load_corpus_or_none():
+    """The TF-IDF corpus, or None (raw counts) if it can't be read."""
+    try:
+        return load_corpus()
+    except OSError as e:
+        print(f"Warning: corpus index unavailable ({e}), ranking by raw counts")
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a transcript through the live analyzer.")
+    parser.add_argument("transcript_file")
+    parser.add_argument("episode_num", nargs="?", default="XXX")
+    parser.add_argument("--every", type=int, default=DEFAULT_REPORT_EVERY,
+                        help=f"print provisional results every N lines (default {DEFAULT_REPORT_EVERY})")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.transcript_file):
+        print(f"Error: Transcript file not found: {args.transcript_file}")
+        sys.exit(1)
+
+    analyzer = LiveAnalyzer(args.episode_num, load_corpus_or_none(), args.every)
+    with open(args.transcript_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                analyzer.add_segment(line.strip())
+
+    result = analyzer.finish()
+    print()
+    for i, title in enumerate(result['titles'], 1):
+        print(f"  {i}. {title}")
@@ -0,0 +1,38 @@
+"""
+Helpers shared by the media and site tools.
+
+Where ffmpeg and ffprobe are (the winget install on the Windows machine,
+otherwise whatever is on PATH), and file fingerprints for deciding whether
+a generated file is out of date. Kept apart from the CLI scripts so the
+site build, audio analysis and cover tools don't import a converter to get
+them.
+"""
+
+import hashlib
+import os
+import shutil
+
+# FFmpeg path (installed via winget)
+FFMPEG_PATH = r"C:\Users\rober\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-8.0.1-full_build\bin\ffmpeg.exe"
+FFPROBE_PATH = os.path.join(os.path.dirname(FFMPEG_PATH), "ffprobe.exe")
+# Elsewhere, whatever is on PATH
+FFMPEG_BINARY = FFMPEG_PATH if os.path.exists(FFMPEG_PATH) else (shutil.which('ffmpeg') or 'ffmpeg')
+FFPROBE_BINARY = FFPROBE_PATH if os.path.exists(FFPROBE_PATH) else (shutil.which('ffprobe') or 'ffprobe')
+
+
+def file_fingerprint(path, previous=None):
+    """
+    Size, mtime and SHA-256 of a file.
+
+    The hash is reused from `previous` when size and mtime are unchanged,
+    so unchanged 70 MB episodes aren't re-read on every batch run.
+    """
+    stat = os.stat(path)
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime') == stat.st_mtime:
+        return previous
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': digest.hexdigest()}
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Read duration, codec, bitrate and channel layout from MP4/M4A headers.
+Usage: python probe_media.py [files or folders ...] [--workers N] [--no-cache]
+                             [--json] [--update-manifest]
+
+Parses the container's moov atom (movie and track headers, the audio sample
+description and its esds, and the sample size table for the exact bitrate)
+without decoding or even reading the audio data. The top-level boxes are
+walked with seeks, so mdat is skipped whether moov comes before it
+(fast-start) or after it. With no arguments every .m4a/.mp4 under episodes/
+is probed, in parallel.
+
+Results are cached in tools/.cache/media-probe.json by file size and mtime,
+so a repeat run over the catalogue only stats the files.
+
+--update-manifest writes the probed durations into the `duration` of the
+matching episodes in episodes.json; run build_site.py afterwards to update
+index.html.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+import argparse
+import glob
+import json
+import os
+import struct
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_FILE = os.path.join(REPO_ROOT, 'tools', '.cache', 'media-probe.json')
+MANIFEST_FILE = os.path.join(REPO_ROOT, 'episodes.json')
+
+# Bump when the reported fields change so cached results are re-read
+PROBE_VERSION = 1
+
+MP4_EXTENSIONS = ('.m4a', '.mp4', '.m4b', '.m4v', '.mov')
+
+# A moov bigger than this isn't an audio episode header; refuse to load it
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+
+# Sample entry (or esds object type) -> ffprobe-style codec name
+SAMPLE_ENTRY_CODECS = {
+    'alac': 'alac', 'ac-3': 'ac3', 'ec-3': 'eac3', 'Opus': 'opus', 'fLaC': 'flac',
+    '.mp3': 'mp3', 'ulaw': 'pcm_mulaw', 'alaw': 'pcm_alaw', 'sowt': 'pcm_s16le', 'twos': 'pcm_s16be',
+}
+OBJECT_TYPE_CODECS = {0x40: 'aac', 0x66: 'aac', 0x67: 'aac', 0x68: 'aac', 0x69: 'mp3', 0x6B: 'mp3'}
+
+# MPEG-4 audio object type -> AAC profile
+AAC_PROFILES = {1: 'Main', 2: 'LC', 3: 'SSR', 4: 'LTP', 5: 'HE-AAC', 23: 'LD', 29: 'HE-AACv2', 39: 'ELD'}
+
+AAC_SAMPLE_RATES = [96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050,
+                    16000, 12000, 11025, 8000, 7350]
+
+# AudioSpecificConfig channelConfiguration -> (channels, layout)
+CHANNEL_CONFIGS = {1: (1, 'mono'), 2: (2, 'stereo'), 3: (3, '3.0'), 4: (4, '4.0'),
+                   5: (5, '5.0'), 6: (6, '5.1'), 7: (8, '7.1')}
+CHANNEL_LAYOUTS = {1: 'mono', 2: 'stereo'}
+
+
+def iter_boxes(data, start, end):
+    """(type, payload_start, payload_end) of the boxes in data[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise ValueError(f"corrupt box '{box_type.decode('latin-1')}' at offset {pos}")
+        yield box_type.decode('latin-1'), pos + header, min(pos + size, end)
+        pos += size
+
+def find_box(data, start, end, *path):
+    """Payload span of the first box along path ('mdia', 'minf', ...), or None."""
+    for name in path:
+        for box_type, payload_start, payload_end in iter_boxes(data, start, end):
+            if box_type == name:
+                start, end = payload_start, payload_end
+                break
+        else:
+            return None
+    return start, end
+
+def read_top_level(f):
+    """
+    Read the moov payload, seeking past every other top-level box.
+
+    Returns (moov bytes, major brand, True if moov precedes mdat).
+    """
+    file_size = os.fstat(f.fileno()).st_size
+    brand = None
+    seen_mdat = False
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack_from('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            raise ValueError(f"corrupt top-level box at offset {pos}")
+
+        if box_type == b'ftyp':
+            brand = header[8:12].decode('latin-1').strip() if len(header) >= 12 else None
+        elif box_type == b'mdat':
+            seen_mdat = True
+        elif box_type == b'moov':
+            length = size - header_size
+            if length > MAX_MOOV_BYTES:
+                raise ValueError(f"moov atom is {length} bytes")
+            f.seek(pos + header_size)
+            moov = f.read(length)
+            if len(moov) < length:
+                raise ValueError("moov atom is truncated")
+            return moov, brand, not seen_mdat
+        elif not all(32 <= byte < 127 for byte in box_type):
+            raise ValueError("not an MP4/QuickTime file")
+        pos += size
+    raise ValueError("no moov atom (incomplete download or not an MP4 file)")
+
+def read_duration_header(data, span):
+    """(timescale, duration) from an mvhd or mdhd payload."""
+    start, _ = span
+    if data[start] == 1:
+        timescale, duration = struct.unpack_from('>IQ', data, start + 20)
+    else:
+        timescale, duration = struct.unpack_from('>II', data, start + 12)
+    return timescale, duration
+
+def read_descriptor(data, pos):
+    """(tag, payload_start, payload_end) of an MPEG-4 descriptor."""
+    tag = data[pos]
+    pos += 1
+    length = 0
+    for _ in range(4):
+        byte = data[pos]
+        pos += 1
+        length = (length << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            break
+    return tag, pos, pos + length
+
+def parse_esds(data, start, end):
+    """Object type, average bitrate and AudioSpecificConfig fields from an esds payload."""
+    info = {}
+    tag, pos, es_end = read_descriptor(data, start + 4)
+    if tag != 0x03:
+        return info
+    flags = data[pos + 2]
+    pos += 3
+    if flags & 0x80:
+        pos += 2
+    if flags & 0x40:
+        pos += 1 + data[pos]
+    if flags & 0x20:
+        pos += 2
+
+    while pos < min(es_end, end):
+        tag, payload, payload_end = read_descriptor(data, pos)
+        if tag == 0x04:
+            info['object_type'] = data[payload]
+            info['avg_bit_rate'] = struct.unpack_from('>I', data, payload + 9)[0]
+            inner = payload + 13
+            while inner < payload_end:
+                tag, config, config_end = read_descriptor(data, inner)
+                if tag == 0x05 and config_end - config >= 2:
+                    info.update(parse_audio_specific_config(data[config:config_end]))
+                inner = config_end
+        pos = payload_end
+    return info
+
+def parse_audio_specific_config(config):
+    bits = int.from_bytes(config, 'big')
+    remaining = len(config) * 8
+
+    def take(n):
+        nonlocal remaining
+        remaining -= n
+        return (bits >> remaining) & ((1 << n) - 1)
+
+    object_type = take(5)
+    if object_type == 31:
+        object_type = 32 + take(6)
+    rate_index = take(4)
+    sample_rate = take(24) if rate_index == 15 else (
+        AAC_SAMPLE_RATES[rate_index] if rate_index < len(AAC_SAMPLE_RATES) else None)
+    info = {'audio_object_type': object_type, 'channel_config': take(4)}
+    if sample_rate:
+        info['config_sample_rate'] = sample_rate
+    return info
+
+def find_esds(data, start, end):
+    """The esds payload in a sample entry's children (also inside a QuickTime 'wave')."""
+    for box_type, payload_start, payload_end in iter_boxes(data, start, end):
+        if box_type == 'esds':
+            return payload_start, payload_end
+        if box_type == 'wave':
+            found = find_esds(data, payload_start, payload_end)
+            if found:
+                return found
+    return None
+
+def parse_sample_entry(data, entry_type, start, end):
+    """Codec, profile, sample rate and channels from an audio sample entry."""
+    version = struct.unpack_from('>H', data, start + 8)[0]
+    channels, _, _, _, rate_fixed = struct.unpack_from('>HHHHI', data, start + 16)
+    sample_rate = rate_fixed >> 16
+    children = start + 28
+    if version == 1:
+        children += 16
+    elif version == 2:
+        sample_rate = int(struct.unpack_from('>d', data, start + 32)[0])
+        channels = struct.unpack_from('>I', data, start + 40)[0]
+        children = start + 64
+
+    info = {'codec': SAMPLE_ENTRY_CODECS.get(entry_type, entry_type.strip()), 'profile': None,
+            'sample_rate': sample_rate, 'channels': channels,
+            'channel_layout': CHANNEL_LAYOUTS.get(channels, f"{channels} channels"),
+            'avg_bit_rate': None}
+
+    esds = find_esds(data, children, end) if children < end else None
+    if esds:
+        config = parse_esds(data, *esds)
+        info['codec'] = OBJECT_TYPE_CODECS.get(config.get('object_type'), info['codec'])
+        info['avg_bit_rate'] = config.get('avg_bit_rate') or None
+        if info['codec'] == 'aac':
+            info['profile'] = AAC_PROFILES.get(config.get('audio_object_type'))
+        if config.get('channel_config') in CHANNEL_CONFIGS:
+            info['channels'], info['channel_layout'] = CHANNEL_CONFIGS[config['channel_config']]
+        if not info['sample_rate'] and config.get('config_sample_rate'):
+            info['sample_rate'] = config['config_sample_rate']
+    return info
+
+def sample_bytes(data, span):
+    """Total size of the track's samples from stsz, or None."""
+    if span is None:
+        return None
+    start, end = span
+    sample_size, count = struct.unpack_from('>II', data, start + 4)
+    if sample_size:
+        return sample_size * count
+    if start + 12 + count * 4 > end:
+        return None
+    sizes = array('I')
+    if sizes.itemsize != 4:
+        return sum(struct.unpack_from(f'>{count}I', data, start + 12))
+    sizes.frombytes(data[start + 12:start + 12 + count * 4])
+    if sys.byteorder == 'little':
+        sizes.byteswap()
+    return sum(sizes)
+
+def read_mp4_info(path):
+    """
+    Duration, codec, bitrate and channels of the first audio track of an
+    MP4/M4A file, from its headers only. Raises ValueError if the file
+    can't be parsed (or OSError if it can't be read).
+    """
+    with open(path, 'rb') as f:
+        moov, brand, fast_start = read_top_level(f)
+    end = len(moov)
+
+    mvhd = find_box(moov, 0, end, 'mvhd')
+    movie_timescale, movie_duration = read_duration_header(moov, mvhd) if mvhd else (0, 0)
+    mehd = find_box(moov, 0, end, 'mvex', 'mehd')
+    fragmented = find_box(moov, 0, end, 'mvex') is not None
+    if mehd and not movie_duration:
+        start, _ = mehd
+        movie_duration = struct.unpack_from('>Q' if moov[start] == 1 else '>I', moov, start + 4)[0]
+
+    for box_type, trak_start, trak_end in iter_boxes(moov, 0, end):
+        if box_type != 'trak':
+            continue
+        mdia = find_box(moov, trak_start, trak_end, 'mdia')
+        hdlr = mdia and find_box(moov, *mdia, 'hdlr')
+        if not hdlr or moov[hdlr[0] + 8:hdlr[0] + 12] != b'soun':
+            continue
+
+        mdhd = find_box(moov, *mdia, 'mdhd')
+        timescale, duration = read_duration_header(moov, mdhd) if mdhd else (0, 0)
+        if duration and timescale:
+            seconds = duration / timescale
+        elif movie_timescale:
+            seconds = movie_duration / movie_timescale
+        else:
+            seconds = 0.0
+
+        stbl = find_box(moov, *mdia, 'minf', 'stbl')
+        stsd = stbl and find_box(moov, *stbl, 'stsd')
+        if not stsd:
+            raise ValueError("audio track has no sample description")
+        entry = next(iter_boxes(moov, stsd[0] + 8, stsd[1]), None)
+        if entry is None:
+            raise ValueError("audio track has an empty sample description")
+        info = parse_sample_entry(moov, *entry)
+
+        total = sample_bytes(moov, find_box(moov, *stbl, 'stsz'))
+        if total and seconds:
+            bit_rate = int(round(total * 8 / seconds))
+        else:
+            bit_rate = info['avg_bit_rate']
+        return {
+            'duration': seconds,
+            'codec': info['codec'],
+            'profile': info['profile'],
+            'bit_rate': bit_rate,
+            'sample_rate': info['sample_rate'],
+            'channels': info['channels'],
+            'channel_layout': info['channel_layout'],
+            'brand': brand,
+            'fast_start': fast_start,
+            'fragmented': fragmented,
+        }
+    raise ValueError("no audio track")
+
+def probe_mp4(path):
+    """
+    read_mp4_info(), or None if the file isn't a readable MP4 or its headers
+    give no duration (same contract as probe_audio).
+    """
+    if not path.lower().endswith(MP4_EXTENSIONS):
+        return None
+    try:
+        info = read_mp4_info(path)
+    except (OSError, ValueError, struct.error, IndexError):
+        return None
+    return info if info['duration'] else None
+
+
+def cache_key(path, root=REPO_ROOT):
+    path = os.path.abspath(path)
+    relative = os.path.relpath(path, root)
+    return path if relative.startswith('..') else relative.replace(os.sep, '/')
+
+def load_cache(path=CACHE_FILE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get('files', {}) if cache.get('version') == PROBE_VERSION else {}
+
+def save_cache(files, path=CACHE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({'version': PROBE_VERSION, 'files': files}, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+def probe_one(path):
+    try:
+        return {'info': read_mp4_info(path)}
+    except (OSError, ValueError, struct.error, IndexError) as e:
+        return {'error': str(e) or type(e).__name__}
+
+def probe_catalogue(paths, workers=None, use_cache=True):
+    """
+    Probe many files in parallel, reusing cached results for files whose
+    size and mtime are unchanged.
+
+    Returns {path: {'info': {...}} or {'error': message}}, plus the number
+    of files actually read.
+    """
+    cache = load_cache() if use_cache else {}
+    results = {}
+    todo = []
+    for path in paths:
+        key = cache_key(path)
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            results[path] = {'error': str(e)}
+            continue
+        cached = cache.get(key)
+        if cached and cached['size'] == stat.st_size and cached['mtime'] == stat.st_mtime:
+            results[path] = cached['result']
+        else:
+            todo.append((path, key, stat))
+
+    if todo:
+        workers = max(1, min(workers or 32, len(todo)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for (path, key, stat), result in zip(todo, pool.map(probe_one, [job[0] for job in todo])):
+                results[path] = result
+                cache[key] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'result': result}
+        if use_cache:
+            try:
+                save_cache(cache)
+            except OSError:
+                pass
+    return results, len(todo)
+
+def find_media(targets):
+    """MP4-family files named in targets (folders are searched recursively)."""
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            for ext in MP4_EXTENSIONS:
+                paths.extend(glob.glob(os.path.join(target, '**', '*' + ext), recursive=True))
+        else:
+            paths.append(target)
+    return sorted(set(paths))
+
+def format_duration(seconds):
+    """Minutes:seconds the way the episode list shows it ('37:07', '72:30')."""
+    total = int(round(seconds))
+    return f"{total // 60}:{total % 60:02d}"
+
+def update_manifest(results, manifest_file=MANIFEST_FILE):
+    """Set the duration of every episode whose audio file was probed; returns the changes."""
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    probed = {cache_key(path): result['info'] for path, result in results.items() if 'info' in result}
+
+    changes = []
+    for episode in manifest.get('episodes', []):
+        info = probed.get(episode.get('file'))
+        if info and info['duration']:
+            duration = format_duration(info['duration'])
+            if episode.get('duration') != duration:
+                changes.append((episode['number'], episode.get('duration'), duration))
+                episode['duration'] = duration
+    if changes:
+        tmp = manifest_file + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        os.replace(tmp, manifest_file)
+    return changes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read MP4/M4A durations and audio details from the headers.")
+    parser.add_argument("targets", nargs="*", help="files or folders (default: episodes/)")
+    parser.add_argument("--workers", type=int, default=None, help="parallel probes (default 32)")
+    parser.add_argument("--no-cache", action="store_true", help="ignore and don't update the probe cache")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--update-manifest", action="store_true",
+                        help="write probed durations into episodes.json")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    paths = find_media(args.targets or [os.path.join(REPO_ROOT, 'episodes')])
+    results, read = probe_catalogue(paths, args.workers, not args.no_cache)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if args.json:
+        print(json.dumps({cache_key(path): result for path, result in results.items()}, indent=2))
+    else:
+        for path, result in results.items():
+            name = cache_key(path)
+            if 'error' in result:
+                print(f"  {name}: ERROR {result['error']}")
+                continue
+            info = result['info']
+            kbps = f"{info['bit_rate'] / 1000:.0f}k" if info['bit_rate'] else "?"
+            codec = info['codec'] + (f" {info['profile']}" if info['profile'] else "")
+            print(f"  {format_duration(info['duration']):>7}  {codec:<12} {kbps:>5}  "
+                  f"{info['sample_rate']} Hz {info['channel_layout']:<8}  {name}")
+        print(f"\n{len(results)} files ({read} read, {len(results) - read} from cache) in {elapsed_ms:.1f} ms")
+
+    if args.update_manifest:
+        changes = update_manifest(results)
+        for number, old, new in changes:
+            print(f"Episode {number}: duration {old or '(none)'} -> {new}")
+        if changes:
+            print("Run tools/build_site.py to update index.html")
+        else:
+            print("Manifest durations already match")
+
+    if any('error' in result for result in results.values()):
+        sys.exit(1)
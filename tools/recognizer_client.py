@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+HTTP client for speech recognizer APIs, used by transcription_backends.py.
+
+Adds what a bare urllib request per chunk lacks:
+    - token-bucket rate limiting shared by all worker threads
+    - exponential backoff with full jitter on 429, 5xx and dropped connections
+      (Retry-After is honoured when the server sends it)
+    - a cap on retries per request
+    - keep-alive connections, one per worker thread, reused across requests
+    - per-request latency and retry statistics
+"""
+
+import http.client
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Status codes worth retrying: throttled or temporarily unavailable
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `burst` saved up."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RequestStats:
+    """Collects latency and retry counts across threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.wait_time = 0.0
+
+    def record(self, latency, attempts, throttled, failed, waited):
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            self.retries += attempts - 1
+            self.throttled += throttled
+            self.failures += 1 if failed else 0
+            self.wait_time += waited
+
+    def summary(self):
+        """Return a dict of totals and latency percentiles (seconds)."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            summary = {
+                'requests': self.requests,
+                'retries': self.retries,
+                'throttled': self.throttled,
+                'failures': self.failures,
+                'rate_limit_wait': round(self.wait_time, 3),
+            }
+        if latencies:
+            summary['latency_p50'] = round(latencies[len(latencies) // 2], 3)
+            summary['latency_p95'] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+            summary['latency_max'] = round(latencies[-1], 3)
+        return summary
+
+
+class RecognizerClient:
+    """
+    POSTs audio to a recognizer endpoint with rate limiting, retries and keep-alive.
+
+    Args:
+        url: Endpoint, e.g. http://www.google.com/speech-api/v2/recognize
+        rate: Requests per second allowed across all threads (None = unlimited)
+        burst: Requests allowed back to back before the rate applies
+        max_retries: Retries per request after the first attempt
+        backoff_base: First backoff delay in seconds, doubled on each retry
+        backoff_max: Upper bound for a single backoff delay
+        timeout: Socket timeout per attempt in seconds
+    """
+
+    def __init__(self, url, rate=None, burst=None, max_retries=4,
+                 backoff_base=0.5, backoff_max=30.0, timeout=60):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme or 'http'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or '/'
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.stats = RequestStats()
+        self.local = threading.local()
+
+    def connection(self):
+        """This thread's keep-alive connection, opened on first use."""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            if self.scheme == 'https':
+                conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+            else:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.local.conn = conn
+        return conn
+
+    def reset_connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        self.local.conn = None
+
+    def backoff(self, attempt, retry_after=None):
+        """Delay before retry number `attempt` (0-based): full jitter, or the server's Retry-After."""
+        if retry_after is not None:
+            return min(self.backoff_max, retry_after)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def post(self, query, body, headers):
+        """
+        POST body to the endpoint, retrying throttled or failed attempts.
+
+        Returns (status_code, response_text). status_code is None when the
+        connection itself kept failing; response_text then holds the error.
+        """
+        path = self.path + ('?' + query if query else '')
+        started = time.monotonic()
+        waited = 0.0
+        throttled = 0
+        status, text = None, ''
+
+        for attempt in range(self.max_retries + 1):
+            if self.bucket:
+                waited += self.bucket.acquire()
+
+            retry_after = None
+            try:
+                conn = self.connection()
+                conn.request('POST', path, body=body, headers=headers)
+                response = conn.getresponse()
+                status = response.status
+                text = response.read().decode('utf-8', errors='replace')
+                if response.will_close:
+                    self.reset_connection()
+                if status not in RETRY_STATUSES:
+                    break
+                throttled += 1 if status == 429 else 0
+                retry_after = parse_retry_after(response.getheader('Retry-After'))
+                text = f"{status} {response.reason}"
+            except (http.client.HTTPException, OSError) as e:
+                # Dropped or stale keep-alive connection: reconnect on retry
+                self.reset_connection()
+                status, text = None, f"connection failed: {e}"
+
+            if attempt < self.max_retries:
+                time.sleep(self.backoff(attempt, retry_after))
+
+        failed = status is None or status in RETRY_STATUSES or status >= 400
+        self.stats.record(time.monotonic() - started, attempt + 1, throttled, failed, waited)
+        return status, text
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (numeric form only), or None."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Build the full-text search index the site queries in the browser.
+Usage: python search_index.py [--shard-bytes N] [--build] [query ...]
+
+Every transcript (episodes/*/ and archive/transcripts/) is tokenized the same
+way as transcript_index.py, and each word gets a posting list: the
+transcripts it appears in and its word positions in each. The index is split
+into shards by term prefix, so a search only downloads the shards holding
+its words, not the transcripts or the whole index:
+
+  search/index.json        documents (title, episode, link, and the
+                           transcript's .timing file if it has a current
+                           one) and the prefix -> shard file table
+  search/<hash>.json       one shard: {"prefix": ..., "terms": {term: postings}}
+
+A shard starts as all terms sharing a first character and is split on the
+next character while it is larger than --shard-bytes, so shards stay small
+as episodes are added. A term lives in the shard with the longest prefix it
+starts with.
+
+Postings are delta-encoded and written as base64 VLQ (the encoding source
+maps use), per document: document delta, number of positions, then the
+first position and the gaps between the rest. Shard files are named by
+their content hash, so unchanged shards keep their names (and browser
+caches) across rebuilds; files no longer referenced are deleted.
+
+With query words, searches the index already in search/ and prints the
+matches (add --build to rebuild it first).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from corpus_index import find_transcripts
+from transcript_index import TranscriptIndex, tokenize
+from transcript_timing import TranscriptTiming, timing_path
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEARCH_DIR = os.path.join(REPO_ROOT, 'search')
+INDEX_FILE = os.path.join(SEARCH_DIR, 'index.json')
+
+# Bump when the file layout or the encoding changes (the page checks it)
+SEARCH_VERSION = 2
+
+# Split a shard on the next prefix character while it is bigger than this
+DEFAULT_SHARD_BYTES = 32 * 1024
+
+VLQ_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+VLQ_VALUES = {char: value for value, char in enumerate(VLQ_ALPHABET)}
+VLQ_CONTINUE = 32
+
+
+def vlq_encode(numbers):
+    """Non-negative integers -> base64 VLQ string, 5 bits per character, low bits first."""
+    chars = []
+    for number in numbers:
+        while True:
+            digit = number & 31
+            number >>= 5
+            if number:
+                chars.append(VLQ_ALPHABET[digit | VLQ_CONTINUE])
+            else:
+                chars.append(VLQ_ALPHABET[digit])
+                break
+    return ''.join(chars)
+
+def vlq_decode(encoded):
+    numbers = []
+    value = shift = 0
+    for char in encoded:
+        digit = VLQ_VALUES[char]
+        value |= (digit & 31) << shift
+        if digit & VLQ_CONTINUE:
+            shift += 5
+        else:
+            numbers.append(value)
+            value = shift = 0
+    return numbers
+
+def encode_postings(postings):
+    """[(doc, [positions]), ...] sorted by doc -> delta-encoded VLQ string."""
+    numbers = []
+    previous_doc = 0
+    for doc, positions in postings:
+        numbers.append(doc - previous_doc)
+        numbers.append(len(positions))
+        previous_position = 0
+        for position in positions:
+            numbers.append(position - previous_position)
+            previous_position = position
+        previous_doc = doc
+    return vlq_encode(numbers)
+
+def decode_postings(encoded):
+    numbers = vlq_decode(encoded)
+    postings = []
+    doc = i = 0
+    while i < len(numbers):
+        doc += numbers[i]
+        count = numbers[i + 1]
+        i += 2
+        positions = []
+        position = 0
+        for gap in numbers[i:i + count]:
+            position += gap
+            positions.append(position)
+        i += count
+        postings.append((doc, positions))
+    return postings
+
+def indexable(token):
+    """Words and numbers; '$' is kept in the positions but not searchable."""
+    return token[0].isalnum()
+
+
+def load_documents(root=REPO_ROOT):
+    """
+    One entry per transcript, in a stable order, with what the page shows
+    for a match: title, the player's episode number (current series) or a
+    link to the transcript page (archive).
+    """
+    try:
+        with open(os.path.join(root, 'episodes.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {'episodes': [], 'archive': []}
+
+    known = {}
+    for episode in manifest.get('episodes', []):
+        if episode.get('transcript'):
+            known[episode['transcript']] = {'title': episode['title'], 'episode': episode['number']}
+    for entry in manifest.get('archive', []):
+        info = {'title': entry['title'], 'code': entry['code']}
+        if 'page' in entry:
+            info['url'] = f"archive/transcripts/episode-{entry['code']}.html"
+        known[f"archive/transcripts/{entry['transcript']}"] = info
+
+    documents = []
+    for path in find_transcripts(root):
+        doc_id = os.path.relpath(path, root).replace(os.sep, '/')
+        info = known.get(doc_id, {'title': os.path.basename(doc_id)})
+        documents.append({'path': path, 'transcript': doc_id, **info})
+    return documents
+
+def collect_postings(documents):
+    """term -> [(doc, [positions])] over all documents, docs in order."""
+    terms = {}
+    for doc, document in enumerate(documents):
+        with open(document['path'], 'r', encoding='utf-8') as f:
+            text = f.read()
+        index = TranscriptIndex.for_text(text)
+        document['words'] = len(index.tokens)
+
+        # Search hits are word positions, which the timing file turns into a seek time
+        timing = TranscriptTiming.load(timing_path(document['path']))
+        if timing and timing.matches(text):
+            document['timing'] = timing_path(document['transcript'])
+        positions = {}
+        for position, token in enumerate(index.tokens):
+            if indexable(token):
+                positions.setdefault(token, []).append(position)
+        for term, term_positions in positions.items():
+            terms.setdefault(term, []).append((doc, term_positions))
+    return terms
+
+def split_shards(encoded, max_bytes=DEFAULT_SHARD_BYTES):
+    """
+    Group encoded terms into shards by prefix.
+
+    Returns {prefix: {term: encoded}}. A group over max_bytes is split on the
+    next character; terms no longer than the prefix stay in the parent.
+    """
+    shards = {}
+    pending = {}
+    for term in sorted(encoded):
+        pending.setdefault(term[:1], {})[term] = encoded[term]
+
+    while pending:
+        prefix, terms = pending.popitem()
+        size = sum(len(term) + len(postings) + 6 for term, postings in terms.items())
+        longer = [term for term in terms if len(term) > len(prefix)]
+        if size <= max_bytes or not longer:
+            shards[prefix] = terms
+            continue
+        kept = {term: postings for term, postings in terms.items() if len(term) <= len(prefix)}
+        if kept:
+            shards[prefix] = kept
+        for term in longer:
+            pending.setdefault(term[:len(prefix) + 1], {})[term] = terms[term]
+    return dict(sorted(shards.items()))
+
+def shard_for(term, shard_prefixes):
+    """The prefix of the shard a term belongs in, or None if no shard can hold it."""
+    for length in range(len(term), 0, -1):
+        if term[:length] in shard_prefixes:
+            return term[:length]
+    return None
+
+def dump(data):
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+def write_file(path, content):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+def build_search_index(root=REPO_ROOT, shard_bytes=DEFAULT_SHARD_BYTES):
+    """Write search/ from the transcripts on disk; returns the index.json data."""
+    documents = load_documents(root)
+    terms = collect_postings(documents)
+    encoded = {term: encode_postings(postings) for term, postings in terms.items()}
+    shards = split_shards(encoded, shard_bytes)
+
+    os.makedirs(SEARCH_DIR, exist_ok=True)
+    files = {}
+    written = 0
+    for prefix, shard_terms in shards.items():
+        content = dump({'prefix': prefix, 'terms': shard_terms})
+        name = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16] + '.json'
+        files[prefix] = name
+        if not os.path.exists(os.path.join(SEARCH_DIR, name)):
+            write_file(os.path.join(SEARCH_DIR, name), content)
+            written += 1
+
+    index = {
+        'version': SEARCH_VERSION,
+        'documents': [{key: value for key, value in document.items() if key != 'path'}
+                      for document in documents],
+        'shards': files,
+    }
+    write_file(INDEX_FILE, dump(index))
+
+    # Shards from earlier builds that nothing refers to any more
+    referenced = set(files.values()) | {os.path.basename(INDEX_FILE)}
+    removed = 0
+    for name in os.listdir(SEARCH_DIR):
+        if name not in referenced:
+            os.remove(os.path.join(SEARCH_DIR, name))
+            removed += 1
+
+    total = sum(os.path.getsize(os.path.join(SEARCH_DIR, name)) for name in files.values())
+    print(f"Search index: {len(documents)} transcripts, {len(terms)} terms, "
+          f"{sum(len(p) for postings in terms.values() for _, p in postings):,} positions")
+    print(f"Shards: {len(files)} ({written} new, {removed} stale removed), "
+          f"{total / 1024:.0f} KB total, largest {max(map(len, map(dump, shards.values()))) / 1024:.1f} KB")
+    return index
+
+def search(query, index=None):
+    """
+    [(document, hits)] for documents containing every query word, the
+    ones with the words as an exact phrase first, then by hits.
+    Reads only the shards the query needs, like the page does.
+    """
+    if index is None:
+        with open(INDEX_FILE, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    words = [token for token in tokenize(query) if indexable(token)]
+    if not words:
+        return []
+
+    shards = {}
+    per_word = []
+    for word in words:
+        prefix = shard_for(word, index['shards'])
+        if prefix is None:
+            return []
+        if prefix not in shards:
+            with open(os.path.join(SEARCH_DIR, index['shards'][prefix]), 'r', encoding='utf-8') as f:
+                shards[prefix] = json.load(f)['terms']
+        encoded = shards[prefix].get(word)
+        if encoded is None:
+            return []
+        per_word.append(dict(decode_postings(encoded)))
+
+    results = []
+    for doc in set.intersection(*(set(postings) for postings in per_word)):
+        hits = sum(len(postings[doc]) for postings in per_word)
+        following = [set(postings[doc]) for postings in per_word]
+        phrases = sum(1 for start in per_word[0][doc]
+                      if all(start + i in following[i] for i in range(1, len(words))))
+        results.append((phrases, hits, doc))
+    results.sort(key=lambda result: (-result[0], -result[1], result[2]))
+    return [(index['documents'][doc], hits, phrases) for phrases, hits, doc in results]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the sharded full-text search index for the site.")
+    parser.add_argument("query", nargs="*", help="search the built index for these words")
+    parser.add_argument("--build", action="store_true",
+                        help="rebuild the index before searching (always done without a query)")
+    parser.add_argument("--shard-bytes", type=int, default=DEFAULT_SHARD_BYTES,
+                        help=f"split shards larger than this (default {DEFAULT_SHARD_BYTES})")
+    args = parser.parse_args()
+
+    if args.build or not args.query:
+        index = build_search_index(shard_bytes=args.shard_bytes)
+        if not index['documents']:
+            print("Error: no transcripts found")
+            sys.exit(1)
+    else:
+        try:
+            with open(INDEX_FILE, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: can't read {INDEX_FILE} ({e}), run without a query to build it")
+            sys.exit(1)
+
+    if args.query:
+        query = ' '.join(args.query)
+        if args.build:
+            print()
+        print(f"Results for: {query}")
+        for document, hits, phrases in search(query, index):
+            phrase_note = f", {phrases} as a phrase" if phrases and len(query.split()) > 1 else ""
+            print(f"  {hits:4d} hits{phrase_note}  {document['title']}  ({document['transcript']})")
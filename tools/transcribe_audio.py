@@ -1,31 +1,285 @@
 #!/usr/bin/env python3
 """
-Transcribe audio file to text using Google Speech Recognition.
-Usage: python transcribe_audio.py <audio_file> [output_file]
+Transcribe audio file to text using Google Speech Recognition or a local model.
+Usage: python transcribe_audio.py <audio_file> [output_file] [--workers N] [--fixed-chunks]
+                                  [--backend google|whisper|http] [--model NAME]
+                                  [--batch-size N] [--url URL]
+                                  [--rate REQ_PER_SEC] [--max-retries N]
+                                  [--audio-analysis]
 
 Supports: .mp3, .m4a, .mp4, .wav
 If no output file is specified, uses audio filename with -transcript.txt suffix.
+Audio is decoded by ffmpeg as a stream of 16 kHz mono PCM and split into
+speech segments at pauses (silence is never sent). Segments are sent to the
+recognizer concurrently (default 4 in flight at once). Backends live in
+transcription_backends.py; whisper batches several segments per inference.
+Segment times are written next to the transcript (<transcript>.timing, see
+transcript_timing.py) so the player can seek to any part of the text.
+With --audio-analysis the recognizer's PCM comes from audio_analysis.py's
+decode, so loudness, the silence map and the player waveform are measured
+in the same pass (written to <audio>-analysis.json).
 """
 
-import speech_recognition as sr
-from pydub import AudioSegment
+from audio_analysis import AudioAnalysis, default_output, print_summary, write_results
+from live_analysis import DEFAULT_REPORT_EVERY, LiveAnalyzer, load_corpus_or_none
+from media_common import FFMPEG_BINARY, FFMPEG_PATH
+from transcription_backends import BACKENDS, GoogleBackend, create_backend
+from transcript_timing import TranscriptTiming, timing_path
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from operator import mul
+import argparse
+import hashlib
+import json
 import math
 import os
+import subprocess
 import sys
 
-# Configure ffmpeg path for pydub
-FFMPEG_PATH = r"C:\Users\rober\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-8.0.1-full_build\bin"
-os.environ["PATH"] = FFMPEG_PATH + os.pathsep + os.environ.get("PATH", "")
-AudioSegment.converter = os.path.join(FFMPEG_PATH, "ffmpeg.exe")
-AudioSegment.ffprobe = os.path.join(FFMPEG_PATH, "ffprobe.exe")
+# Configure ffmpeg path (for libraries that run ffmpeg themselves)
+os.environ["PATH"] = os.path.dirname(FFMPEG_PATH) + os.pathsep + os.environ.get("PATH", "")
 
-def transcribe_audio(audio_file, output_file=None):
+# Number of chunks in flight at once. The recognizer is network bound,
+# so a handful of threads hides most of the round trip latency.
+DEFAULT_WORKERS = 4
+
+# PCM format handed to the recognizer: 16-bit mono at 16 kHz
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+BYTES_PER_MS = SAMPLE_RATE * SAMPLE_WIDTH // 1000
+
+# Split into 30-second chunks for API limits
+CHUNK_LENGTH_MS = 30000
+
+# Silence-aware segmentation settings
+FRAME_MS = 20                 # energy is measured per 20 ms frame
+DECODE_WINDOW_MS = 1000       # PCM read from ffmpeg per step while segmenting
+SILENCE_THRESH_DB = -40.0     # frames quieter than this (dBFS) count as silence
+MIN_PAUSE_MS = 300            # shortest silence treated as a pause between words/phrases
+SEGMENT_BREAK_MS = 2000       # a pause this long always ends the current segment
+SEGMENT_PADDING_MS = 200      # silence kept around speech so word edges aren't clipped
+
+def stream_audio_chunks(audio_file, chunk_length_ms=CHUNK_LENGTH_MS):
+    """
+    Decode an audio file through an ffmpeg pipe, one chunk at a time.
+
+    ffmpeg downmixes and resamples to the recognizer's format as it decodes,
+    so only one chunk of PCM is held in memory regardless of episode length.
+
+    Yields (start_ms, end_ms, pcm_bytes) tuples.
+    """
+    cmd = [
+        FFMPEG_BINARY,
+        '-nostdin',
+        '-loglevel', 'error',
+        '-i', audio_file,
+        '-f', 's16le',
+        '-acodec', 'pcm_s16le',
+        '-ac', '1',
+        '-ar', str(SAMPLE_RATE),
+        '-',
+    ]
+    chunk_bytes = chunk_length_ms * BYTES_PER_MS
+
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        start_ms = 0
+        while True:
+            pcm = proc.stdout.read(chunk_bytes)
+            if not pcm:
+                break
+            end_ms = start_ms + len(pcm) // BYTES_PER_MS
+            yield start_ms, end_ms, pcm
+            start_ms = end_ms
+    finally:
+        proc.stdout.close()
+        stderr = proc.stderr.read().decode('utf-8', errors='replace')
+        proc.stderr.close()
+        returncode = proc.wait()
+
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with code {returncode}: {stderr.strip()}")
+
+def frame_rms(frame):
+    """Root-mean-square level of a 16-bit little-endian PCM frame."""
+    samples = array('h')
+    samples.frombytes(frame)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(map(mul, samples, samples)) / len(samples))
+
+def segment_speech(pcm_stream, max_segment_ms=CHUNK_LENGTH_MS,
+                   silence_thresh_db=SILENCE_THRESH_DB, min_pause_ms=MIN_PAUSE_MS,
+                   break_ms=SEGMENT_BREAK_MS, padding_ms=SEGMENT_PADDING_MS):
+    """
+    Group a PCM stream into speech segments with boundaries in pauses.
+
+    Consecutive speech runs are merged until the next one would push the
+    segment past max_segment_ms (the API limit). A segment that reaches the
+    limit is cut at its most recent pause, or at its quietest frame if the
+    speaker never paused. Leading/trailing silence beyond padding_ms is
+    dropped, and segments with no speech at all are never produced.
+
+    Args:
+        pcm_stream: Iterable of (start_ms, end_ms, pcm_bytes), e.g. stream_audio_chunks()
+
+    Yields (start_ms, end_ms, pcm_bytes) tuples, offsets relative to the file start.
+    """
+    frame_bytes = FRAME_MS * BYTES_PER_MS
+    threshold = 32768 * 10 ** (silence_thresh_db / 20)
+    max_frames = max(1, max_segment_ms // FRAME_MS)
+    pause_frames = max(1, min_pause_ms // FRAME_MS)
+    break_frames = max(1, break_ms // FRAME_MS)
+    pad_frames = padding_ms // FRAME_MS
+
+    # Current segment: list of (pcm, is_speech, rms) frames starting at seg_start
+    frames = []
+    seg_start = 0
+    has_speech = False
+    trailing = 0                       # silent frames at the end of the segment
+    lead_in = deque(maxlen=pad_frames)  # silence just before the next segment
+    pos_ms = 0
+    leftover = b''
+
+    def emit(kept):
+        """Build a segment from kept frames, dropping surplus edge silence."""
+        speech_at = [i for i, f in enumerate(kept) if f[1]]
+        if not speech_at:
+            return None
+        first = max(0, speech_at[0] - pad_frames)
+        last = min(len(kept), speech_at[-1] + 1 + pad_frames)
+        pcm = b''.join(f[0] for f in kept[first:last])
+        return seg_start + first * FRAME_MS, seg_start + last * FRAME_MS, pcm
+
+    def cut_point():
+        """Index to split an over-long segment at: last pause, else quietest frame."""
+        run = 0
+        for i in range(len(frames) - 1, 0, -1):
+            if frames[i][1]:
+                if run >= pause_frames:
+                    return i + 1 + run // 2
+                run = 0
+            else:
+                run += 1
+        half = len(frames) // 2
+        return min(range(half, len(frames)), key=lambda i: frames[i][2]) + 1
+
+    for _, _, pcm in pcm_stream:
+        data = leftover + pcm
+        usable = len(data) - len(data) % frame_bytes
+        leftover = data[usable:]
+
+        for offset in range(0, usable, frame_bytes):
+            frame = data[offset:offset + frame_bytes]
+            rms = frame_rms(frame)
+            speech = rms >= threshold
+            frame_start = pos_ms
+            pos_ms += FRAME_MS
+
+            if not has_speech:
+                if not speech:
+                    # Silence between segments is never sent; keep only the padding
+                    lead_in.append((frame, speech, rms))
+                    continue
+                frames = list(lead_in)
+                seg_start = frame_start - len(frames) * FRAME_MS
+                lead_in.clear()
+                has_speech = True
+
+            frames.append((frame, speech, rms))
+            trailing = 0 if speech else trailing + 1
+
+            if trailing >= break_frames:
+                # Long pause: close the segment here
+                segment = emit(frames)
+                if segment:
+                    yield segment
+                frames = []
+                has_speech = False
+                trailing = 0
+            elif len(frames) >= max_frames:
+                # API limit reached: split at the best boundary, carry the rest over
+                cut = cut_point()
+                segment = emit(frames[:cut])
+                if segment:
+                    yield segment
+                seg_start += cut * FRAME_MS
+                frames = frames[cut:]
+                has_speech = any(f[1] for f in frames)
+                trailing = 0
+                for f in reversed(frames):
+                    if f[1]:
+                        break
+                    trailing += 1
+                if not has_speech:
+                    lead_in.extend(frames)
+                    frames = []
+
+    if frames:
+        segment = emit(frames)
+        if segment:
+            yield segment
+
+def file_hash(path, block_size=1024 * 1024):
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_checkpoint(checkpoint_file, audio_hash, params):
+    """
+    Load finished chunk results from a checkpoint file.
+
+    Only entries for the same audio content and chunking parameters are kept,
+    and failed chunks are left out so they get retried.
+
+    Returns a dict mapping (start_ms, end_ms) to (status, text).
+    """
+    done = {}
+    if not os.path.exists(checkpoint_file):
+        return done
+
+    with open(checkpoint_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A run killed mid-write can leave a torn last line
+                continue
+            if entry.get('audio') != audio_hash or entry.get('params') != params:
+                continue
+            if entry['status'] in ('ok', 'silence'):
+                done[(entry['start_ms'], entry['end_ms'])] = (entry['status'], entry['text'])
+
+    return done
+
+def transcribe_audio(audio_file, output_file=None, workers=DEFAULT_WORKERS,
+                     fixed_chunks=False, silence_thresh_db=SILENCE_THRESH_DB, backend=None,
+                     on_text=None, analysis=None):
     """
     Transcribe an audio file to text.
 
     Args:
         audio_file: Path to audio file (.mp3, .m4a, .mp4, .wav)
         output_file: Optional output path. Defaults to audio filename with -transcript.txt
+        workers: Number of chunks sent to the recognizer concurrently (1 = sequential)
+        fixed_chunks: Send fixed 30-second chunks instead of silence-bounded segments
+        silence_thresh_db: Level (dBFS) below which audio counts as silence
+        backend: TranscriptionBackend to use. Defaults to GoogleBackend()
+        on_text: Optional callable given each recognized chunk's text in
+            transcript order, as soon as every earlier chunk is done
+            (e.g. a live_analysis.LiveAnalyzer)
+        analysis: Optional audio_analysis.AudioAnalysis of audio_file to take the
+            PCM from instead of a separate ffmpeg decode; its results are
+            complete once this returns True
+
+    Each finished chunk is appended to <output_file>.checkpoint as it completes.
+    Rerunning the same command only sends chunks that are missing or failed.
     """
 
     if not os.path.exists(audio_file):
@@ -37,73 +291,158 @@ def transcribe_audio(audio_file, output_file=None):
         base_name = os.path.splitext(audio_file)[0]
         output_file = base_name + "-transcript.txt"
 
-    # Determine file format
-    ext = os.path.splitext(audio_file)[1].lower()
+    if backend is None:
+        backend = GoogleBackend()
 
-    print(f"Loading audio file: {audio_file}")
-    print(f"Format: {ext}")
+    workers = max(1, workers)
+    if backend.max_workers:
+        workers = min(workers, backend.max_workers)
 
-    try:
-        if ext == '.mp3':
-            audio = AudioSegment.from_mp3(audio_file)
-        elif ext == '.m4a':
-            audio = AudioSegment.from_file(audio_file, format='m4a')
-        elif ext == '.mp4':
-            audio = AudioSegment.from_file(audio_file, format='mp4')
-        elif ext == '.wav':
-            audio = AudioSegment.from_wav(audio_file)
-        else:
-            # Try generic loading
-            audio = AudioSegment.from_file(audio_file)
-    except Exception as e:
-        print(f"Error loading audio: {e}")
-        return False
-
-    # Get duration
-    duration_seconds = len(audio) / 1000
-    print(f"Duration: {duration_seconds:.2f} seconds ({duration_seconds/60:.2f} minutes)")
+    # Checkpoint entries are keyed by audio content, chunking parameters and offsets
+    if fixed_chunks:
+        params = f"{backend.checkpoint_key()}|fixed:{CHUNK_LENGTH_MS}"
+    else:
+        params = (f"{backend.checkpoint_key()}|silence:{CHUNK_LENGTH_MS}:{silence_thresh_db}:"
+                  f"{MIN_PAUSE_MS}:{SEGMENT_BREAK_MS}:{SEGMENT_PADDING_MS}:{FRAME_MS}")
+    if analysis:
+        # Resampled by NumPy rather than ffmpeg, so segment edges can differ slightly
+        params += "|shared-decode"
+    checkpoint_file = output_file + ".checkpoint"
+    audio_hash = file_hash(audio_file)
+    cached = load_checkpoint(checkpoint_file, audio_hash, params)
 
-    # Split into 30-second chunks for API limits
-    chunk_length_ms = 30000  # 30 seconds
-    chunks_count = math.ceil(len(audio) / chunk_length_ms)
-    print(f"Processing {chunks_count} chunks...")
+    print(f"Streaming audio file: {audio_file}")
+    print(f"Format: {os.path.splitext(audio_file)[1].lower()}")
+    print(f"Backend: {backend.checkpoint_key()} (batch size {backend.batch_size})")
+    if fixed_chunks:
+        print(f"Processing {CHUNK_LENGTH_MS // 1000}-second chunks ({workers} in flight)...")
+    else:
+        print(f"Processing speech segments up to {CHUNK_LENGTH_MS // 1000} seconds ({workers} in flight)...")
+    if cached:
+        print(f"Resuming: {len(cached)} chunks already done in {checkpoint_file}")
     print()
 
-    recognizer = sr.Recognizer()
-    full_transcript = []
+    # One slot per chunk so results stay in order regardless of completion order
+    results = []
+    spans = []
+    duration_ms = 0
+    # First slot not yet passed to on_text
+    next_slot = 0
 
-    for i in range(chunks_count):
-        start_ms = i * chunk_length_ms
-        end_ms = min((i + 1) * chunk_length_ms, len(audio))
+    def release():
+        # Hand finished text to on_text in order; a slow chunk holds back later ones
+        nonlocal next_slot
+        while next_slot < len(results) and results[next_slot] is not None:
+            status, text = results[next_slot]
+            if on_text and status == 'ok':
+                on_text(text)
+            next_slot += 1
 
-        chunk = audio[start_ms:end_ms]
-        chunk_file = f"_temp_chunk_{i}.wav"
+    def report(i, start_ms, end_ms, status, text, from_checkpoint=False):
+        results[i] = (status, text)
+        spans[i] = (start_ms, end_ms)
 
-        print(f"[{i+1}/{chunks_count}] {start_ms/1000:.1f}s - {end_ms/1000:.1f}s ... ", end="", flush=True)
+        label = f"[chunk {i+1}] {start_ms/1000:.1f}s - {end_ms/1000:.1f}s ... "
+        if from_checkpoint:
+            print(label + "(from checkpoint)")
+            release()
+            return
 
-        # Export chunk as WAV
-        chunk.export(chunk_file, format="wav")
+        checkpoint.write(json.dumps({
+            'audio': audio_hash,
+            'params': params,
+            'start_ms': start_ms,
+            'end_ms': end_ms,
+            'status': status,
+            'text': text,
+        }) + "\n")
+        checkpoint.flush()
 
-        # Transcribe
-        try:
-            with sr.AudioFile(chunk_file) as source:
-                audio_data = recognizer.record(source)
-                text = recognizer.recognize_google(audio_data)
-                full_transcript.append(text)
-                print(f"OK")
-        except sr.UnknownValueError:
-            print("(silence/unclear)")
-        except sr.RequestError as e:
-            print(f"API error: {e}")
-            break
-        except Exception as e:
-            print(f"Error: {e}")
+        if status == 'ok':
+            print(label + "OK")
+        elif status == 'silence':
+            print(label + "(silence/unclear)")
+        elif status == 'api_error':
+            print(label + f"API error: {text}")
+        else:
+            print(label + f"Error: {text}")
+        release()
+
+    # The RuntimeError the decoder failed with, told apart from errors raised
+    # by the backend, the checkpoint or on_text while the pool runs
+    decode_error = None
 
-        # Clean up chunk file
+    def decoded(stream):
+        # Track how much audio ffmpeg produced, silence included
+        nonlocal duration_ms, decode_error
         try:
-            os.remove(chunk_file)
-        except:
-            pass
+            for start_ms, end_ms, pcm in stream:
+                duration_ms = end_ms
+                yield start_ms, end_ms, pcm
+        except RuntimeError as e:
+            decode_error = e
+            raise
+
+    def decode(chunk_length_ms):
+        if analysis:
+            return analysis.speech_stream(chunk_length_ms)
+        return stream_audio_chunks(audio_file, chunk_length_ms)
+
+    if fixed_chunks:
+        chunks = decoded(decode(CHUNK_LENGTH_MS))
+    else:
+        chunks = segment_speech(decoded(decode(DECODE_WINDOW_MS)),
+                                silence_thresh_db=silence_thresh_db)
+
+    def collect(done):
+        for future in done:
+            for (i, start_ms, end_ms), (status, text) in zip(pending.pop(future), future.result()):
+                report(i, start_ms, end_ms, status, text)
+
+    def submit(batch):
+        # Keep the decoder only a little ahead of the recognizer so
+        # at most a couple of batches per worker sit in memory
+        while len(pending) >= workers * 2:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+
+        future = pool.submit(backend.transcribe_batch, [pcm for _, pcm in batch])
+        pending[future] = [slot for slot, _ in batch]
+
+    pending = {}
+    batch = []
+    try:
+        with open(checkpoint_file, 'a', encoding='utf-8') as checkpoint, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            for i, (start_ms, end_ms, pcm) in enumerate(chunks):
+                results.append(None)
+                spans.append(None)
+
+                if (start_ms, end_ms) in cached:
+                    report(i, start_ms, end_ms, *cached[(start_ms, end_ms)], from_checkpoint=True)
+                    continue
+
+                batch.append(((i, start_ms, end_ms), pcm))
+                if len(batch) >= backend.batch_size:
+                    submit(batch)
+                    batch = []
+
+            if batch:
+                submit(batch)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+    except Exception as e:
+        if e is decode_error:
+            print(f"Error decoding audio: {e}")
+            return False
+        print(f"\nTranscription failed; finished chunks are kept in {checkpoint_file}")
+        raise
+
+    duration_seconds = duration_ms / 1000
+    full_transcript = [text for status, text in results if status == 'ok']
+    failed = [i + 1 for i, (status, _) in enumerate(results) if status in ('api_error', 'error')]
 
     # Join all transcripts
     final_transcript = " ".join(full_transcript)
@@ -112,29 +451,121 @@ def transcribe_audio(audio_file, output_file=None):
     with open(output_file, "w", encoding="utf-8") as f:
         f.write(final_transcript)
 
+    # Where each recognized segment's text starts, against its time in the audio
+    segments = []
+    offset = 0
+    for (status, text), (start_ms, end_ms) in zip(results, spans):
+        if status == 'ok':
+            segments.append((start_ms, end_ms, offset))
+            offset += len(text) + 1
+    timing_file = timing_path(output_file)
+    TranscriptTiming.from_segments(segments, final_transcript).save(timing_file)
+
     print()
     print("=" * 60)
     print(f"Transcription complete!")
+    print(f"Duration: {duration_seconds:.2f} seconds ({duration_seconds/60:.2f} minutes)")
+    print(f"Chunks: {len(results)} ({sum(end - start for start, end in spans) / 1000:.0f}s of audio sent)")
     print(f"Output: {output_file}")
     print(f"Length: {len(final_transcript)} characters")
+    print(f"Timing: {timing_file} ({len(segments)} segments)")
+    if failed:
+        print(f"Failed chunks: {', '.join(str(n) for n in failed)}")
+        print(f"Rerun the same command to retry them; finished chunks are kept in {checkpoint_file}")
+    stats = backend.stats_summary()
+    if stats and stats['requests']:
+        print(f"Requests: {stats['requests']} ({stats['retries']} retries, {stats['throttled']} throttled, "
+              f"{stats['failures']} failed)")
+        print(f"Latency: p50 {stats['latency_p50']:.2f}s, p95 {stats['latency_p95']:.2f}s, "
+              f"max {stats['latency_max']:.2f}s; rate limit wait {stats['rate_limit_wait']:.1f}s")
     print("=" * 60)
 
+    # Everything transcribed, so the checkpoint has served its purpose
+    if not failed:
+        try:
+            os.remove(checkpoint_file)
+        except OSError:
+            pass
+
     return True
 
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python transcribe_audio.py <audio_file> [output_file]")
+        print("Usage: python transcribe_audio.py <audio_file> [output_file] [--workers N] [--fixed-chunks]")
         print()
         print("Supported formats: .mp3, .m4a, .mp4, .wav")
         print()
         print("Example:")
         print("  python transcribe_audio.py episode.m4a")
         print("  python transcribe_audio.py episode.mp3 my-transcript.txt")
+        print("  python transcribe_audio.py episode.m4a --workers 8")
+        print("  python transcribe_audio.py episode.m4a --silence-thresh -35")
+        print("  python transcribe_audio.py episode.m4a --backend whisper --model small")
+        print("  python transcribe_audio.py episode.m4a --analyze 011")
+        print("  python transcribe_audio.py episode.m4a --audio-analysis")
         sys.exit(1)
 
-    audio = sys.argv[1]
-    output = sys.argv[2] if len(sys.argv) > 2 else None
+    parser = argparse.ArgumentParser(description="Transcribe audio file to text.")
+    parser.add_argument("audio_file")
+    parser.add_argument("output_file", nargs="?", default=None)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"chunks sent to the recognizer at once (default {DEFAULT_WORKERS})")
+    parser.add_argument("--fixed-chunks", action="store_true",
+                        help="split into fixed 30-second chunks instead of at pauses")
+    parser.add_argument("--silence-thresh", type=float, default=SILENCE_THRESH_DB,
+                        help=f"silence level in dBFS (default {SILENCE_THRESH_DB})")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="google",
+                        help="speech recognition engine (default google)")
+    parser.add_argument("--model", dest="model_name", default=None,
+                        help="whisper model: tiny, base, small, medium, large (default small)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="segments per whisper inference call (default 8)")
+    parser.add_argument("--url", default=None,
+                        help="recognizer endpoint for the http backend, e.g. fake_recognizer.py")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="max recognizer requests per second (google default 4)")
+    parser.add_argument("--max-retries", type=int, default=None,
+                        help="retries per chunk on throttling or connection errors (default 4)")
+    parser.add_argument("--analyze", nargs="?", const="XXX", default=None, metavar="EPISODE",
+                        help="generate title options and cover prompt while transcribing")
+    parser.add_argument("--analyze-every", type=int, default=DEFAULT_REPORT_EVERY,
+                        help=f"print provisional titles every N chunks (default {DEFAULT_REPORT_EVERY})")
+    parser.add_argument("--audio-analysis", action="store_true",
+                        help="measure loudness, silence and the waveform from the same decode")
+    args = parser.parse_args()
 
-    success = transcribe_audio(audio, output)
+    try:
+        backend = create_backend(args.backend, model_name=args.model_name,
+                                 batch_size=args.batch_size, url=args.url,
+                                 rate=args.rate, max_retries=args.max_retries)
+    except (RuntimeError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    analyzer = None
+    if args.analyze is not None:
+        analyzer = LiveAnalyzer(args.analyze, load_corpus_or_none(), args.analyze_every)
+
+    analysis = None
+    if args.audio_analysis:
+        try:
+            analysis = AudioAnalysis(args.audio_file, silence_thresh_db=args.silence_thresh)
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    success = transcribe_audio(args.audio_file, args.output_file, workers=args.workers,
+                               fixed_chunks=args.fixed_chunks,
+                               silence_thresh_db=args.silence_thresh,
+                               backend=backend, on_text=analyzer, analysis=analysis)
+    if success and analyzer:
+        print()
+        analyzer.finish()
+    if success and analysis:
+        print()
+        analysis_file = default_output(args.audio_file)
+        results = analysis.results()
+        write_results(results, analysis_file)
+        print_summary(results, analysis_file)
     sys.exit(0 if success else 1)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Shared transcript analysis used by generate_title.py and generate_cover_prompt.py.
+Usage: python transcript_index.py <transcript_file>
+
+Tokenizes a transcript once into lowercase tokens with character offsets,
+unigram/bigram/trigram frequencies and the proper nouns found in the original
+casing. The result is kept in memory keyed by the transcript's content hash,
+so every extractor in a run (both generators, a batch, the corpus and search
+builds) shares one tokenization. It isn't stored on disk: building it takes
+about as long as reading back a serialized copy, which would be ten times
+the size of the transcript.
+
+IncrementalIndex builds the same index segment by segment while a transcript
+is still being produced (see live_analysis.py).
+"""
+
+import hashlib
+import re
+import sys
+from collections import Counter
+
+# Longest phrase the n-gram tables cover
+MAX_NGRAM = 3
+
+# Numbers keep their thousands separators and decimals ('75,000', '2.5');
+# words keep inner hyphens/apostrophes ('ms-13', "don't"); '$' is its own token
+TOKEN_PATTERN = re.compile(r"\$|\d+(?:,\d{3})*(?:\.\d+)?|[a-z0-9]+(?:[-'][a-z0-9]+)*", re.IGNORECASE)
+# Dropped from the end of a token, so a possessive counts as its word ("cartel's" -> "cartel")
+POSSESSIVE_SUFFIX = "'s"
+
+# Capitalized words, optionally paired ("Sinaloa", "Federal Agent")
+PROPER_NOUN_PATTERN = re.compile(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\b')
+
+# Names that matter regardless of capitalization in the transcript
+NAMED_ENTITY_PATTERN = re.compile(r'\b(iPhone|Android|WhatsApp|Signal|Telegram|MS-13|Sinaloa|cartel)\b')
+
+# In-process cache so both generators in one run share the same index
+_memory_cache = {}
+
+
+class TranscriptIndex:
+    """
+    Token-level view of one transcript.
+
+    Attributes:
+        tokens: Lowercase tokens in order
+        offsets: Character offset of each token in the original text
+        ngrams: Counters of 1-, 2- and 3-token phrases (joined with spaces)
+        proper_nouns: Capitalized names in order of first appearance
+        text_hash: SHA-256 of the transcript text
+    """
+
+    def __init__(self, tokens, offsets, proper_nouns, text_hash, ngrams=None):
+        self.tokens = tokens
+        self.offsets = offsets
+        self.proper_nouns = proper_nouns
+        self.text_hash = text_hash
+        self.ngrams = ngrams or count_ngrams(tokens)
+
+    @classmethod
+    def build(cls, text):
+        """Tokenize text in one pass (plus one pass for case-sensitive names)."""
+        tokens = []
+        offsets = []
+        for token, offset in iter_tokens(text):
+            tokens.append(token)
+            offsets.append(offset)
+
+        proper_nouns = []
+        seen = set()
+        for pattern in (PROPER_NOUN_PATTERN, NAMED_ENTITY_PATTERN):
+            for name in pattern.findall(text):
+                if name not in seen:
+                    seen.add(name)
+                    proper_nouns.append(name)
+
+        return cls(tokens, offsets, proper_nouns, text_hash(text))
+
+    @classmethod
+    def for_text(cls, text):
+        """Get the index for text, from memory or by building it."""
+        digest = text_hash(text)
+        if digest not in _memory_cache:
+            _memory_cache[digest] = cls.build(text)
+        return _memory_cache[digest]
+
+    def remember(self):
+        """Put an index built elsewhere (e.g. incrementally) into the cache for_text reads."""
+        _memory_cache[self.text_hash] = self
+
+    def count(self, term):
+        """How often a word or phrase (up to MAX_NGRAM tokens) occurs as whole tokens."""
+        parts = tokenize(term)
+        if not parts:
+            return 0
+        if len(parts) > MAX_NGRAM:
+            return self.count_sequence(parts)
+        return self.ngrams[len(parts)][' '.join(parts)]
+
+    def count_sequence(self, parts):
+        """Count a phrase longer than the n-gram tables by scanning tokens."""
+        n = len(parts)
+        return sum(1 for i in range(len(self.tokens) - n + 1) if self.tokens[i:i + n] == parts)
+
+    def contains(self, term):
+        return self.count(term) > 0
+
+    def followed_by(self, first, choices):
+        """
+        Yield (i, next_token) wherever a token matching `first` is directly
+        followed by a token in `choices`. `first` is a compiled regex.
+        """
+        for i in range(len(self.tokens) - 1):
+            if first.fullmatch(self.tokens[i]) and self.tokens[i + 1] in choices:
+                yield i, self.tokens[i + 1]
+
+
+class IncrementalIndex:
+    """
+    Builds a TranscriptIndex one segment at a time.
+
+    Segments are joined with single spaces, exactly as transcribe_audio()
+    joins them, so after the last segment index() equals
+    TranscriptIndex.build(text()) and has the same text_hash. Each segment is
+    tokenized once; n-grams spanning the boundary with the previous segment
+    are counted as the new tokens arrive.
+    """
+
+    def __init__(self):
+        self.segments = []
+        self.tokens = []
+        self.offsets = []
+        self.ngrams = {n: Counter() for n in range(1, MAX_NGRAM + 1)}
+        self.length = 0
+        self.hasher = hashlib.sha256()
+        # Ordered sets of names, kept apart so the combined order matches build()
+        self.proper = {}
+        self.named = {}
+        # Capitalized word at the very end of the last segment; it may pair
+        # with the first word of the next one ("Federal" + "Agent")
+        self.carry = ''
+
+    def add(self, text):
+        """Append one segment of transcript text."""
+        separator = ' ' if self.segments else ''
+        self.segments.append(text)
+        self.hasher.update((separator + text).encode('utf-8'))
+        base = self.length + len(separator)
+        self.length = base + len(text)
+
+        for token, offset in iter_tokens(text):
+            self.tokens.append(token)
+            self.offsets.append(base + offset)
+            end = len(self.tokens)
+            for n in range(1, MAX_NGRAM + 1):
+                if end >= n:
+                    self.ngrams[n][' '.join(self.tokens[end - n:end])] += 1
+
+        scan = self.carry + ' ' + text if self.carry else text
+        self.carry = ''
+        for match in PROPER_NOUN_PATTERN.finditer(scan):
+            name = match.group(1)
+            if match.end() == len(scan) and ' ' not in name:
+                self.carry = name
+            else:
+                self.proper.setdefault(name, None)
+        for name in NAMED_ENTITY_PATTERN.findall(text):
+            self.named.setdefault(name, None)
+
+    def text(self):
+        return ' '.join(self.segments)
+
+    def index(self):
+        """
+        TranscriptIndex of everything added so far.
+
+        It shares this builder's token lists and counters, so read it before
+        the next add() rather than keeping it around.
+        """
+        proper = dict(self.proper)
+        if self.carry:
+            proper.setdefault(self.carry, None)
+        names = list(proper) + [name for name in self.named if name not in proper]
+        return TranscriptIndex(self.tokens, self.offsets, names,
+                               self.hasher.copy().hexdigest(), self.ngrams)
+
+
+def iter_tokens(text):
+    """Yield (token, character offset) for every token of text, lowercased."""
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group(0).lower()
+        if token.endswith(POSSESSIVE_SUFFIX):
+            token = token[:-len(POSSESSIVE_SUFFIX)]
+        yield token, match.start()
+
+def tokenize(text):
+    """The tokens of a word, phrase or query, the way transcripts are tokenized."""
+    return [token for token, _ in iter_tokens(text)]
+
+def text_hash(text):
+    """SHA-256 of the transcript text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def count_ngrams(tokens, max_n=MAX_NGRAM):
+    """Counters of 1..max_n token phrases, keyed by n."""
+    ngrams = {}
+    for n in range(1, max_n + 1):
+        ngrams[n] = Counter(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    return ngrams
+
+def load_transcript_index(transcript_file):
+    """Read a transcript file and return (text, index)."""
+    with open(transcript_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return text, TranscriptIndex.for_text(text)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python transcript_index.py <transcript_file>")
+        sys.exit(1)
+
+    text, index = load_transcript_index(sys.argv[1])
+    print(f"Tokens: {len(index.tokens)}")
+    print(f"Distinct words: {len(index.ngrams[1])}")
+    print(f"Top words: {', '.join(w for w, _ in index.ngrams[1].most_common(15))}")
+    print(f"Top phrases: {', '.join(p for p, _ in index.ngrams[2].most_common(10))}")
+    print(f"Proper nouns: {', '.join(index.proper_nouns[:15])}")
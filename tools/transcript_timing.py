@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Audio timing for a transcript: where each recognized segment sits in the
+text and in the audio.
+Usage: python transcript_timing.py <transcript_file> [phrase or time ...]
+
+transcribe_audio.py writes <transcript>.timing next to every transcript it
+produces. Each segment sent to the recognizer is one entry in four arrays
+of unsigned 32-bit little-endian integers:
+
+  starts    segment start in the audio (ms)
+  ends      segment end in the audio (ms)
+  chars     character offset of the segment's text in the transcript
+  words     token position of that text (transcript_index.py tokens, the
+            positions search_index.py's postings hold)
+
+after a 28-byte header: magic, version, segment count, the transcript's
+length in characters and tokens, and the first 8 bytes of its SHA-256 so a
+hand-edited transcript is noticed. That is 16 bytes a segment, a few KB for
+an hour-long episode, and the arrays load straight into array('I') (or a
+Uint32Array in the page) with no parsing.
+
+Both directions are a binary search: a word or character position finds
+its segment in words/chars, a time finds its segment in starts. Inside a
+segment the position is interpolated, since the recognizers return text
+without word times.
+
+With arguments, prints when each phrase is first spoken, and what is being
+said at each time (m:ss or seconds).
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+import hashlib
+import os
+import re
+import struct
+import sys
+
+from transcript_index import TranscriptIndex, tokenize
+
+TIMING_MAGIC = b'UFTT'
+
+# Bump when the layout changes; readers ignore other versions
+TIMING_VERSION = 1
+
+# magic, version, reserved, segments, characters, words, text hash prefix
+HEADER = struct.Struct('<4sHHIII8s')
+
+TIME_ARGUMENT = re.compile(r'^(?:(\d+):)?(\d+(?:\.\d+)?)$')
+
+
+def timing_path(transcript_file):
+    return os.path.splitext(transcript_file)[0] + '.timing'
+
+def text_digest(text):
+    return hashlib.sha256(text.encode('utf-8')).digest()[:8]
+
+
+class TranscriptTiming:
+    """
+    Segment start/end times against character and token positions.
+
+    Attributes:
+        starts, ends: Segment times in ms
+        chars: Character offset of each segment's text
+        words: Token position of each segment's first token
+        total_chars, total_words: Transcript length, closing the last segment
+        text_hash: First 8 bytes of the transcript's SHA-256
+    """
+
+    def __init__(self, starts, ends, chars, words, total_chars, total_words, text_hash):
+        self.starts = starts
+        self.ends = ends
+        self.chars = chars
+        self.words = words
+        self.total_chars = total_chars
+        self.total_words = total_words
+        self.text_hash = text_hash
+
+    @classmethod
+    def from_segments(cls, segments, text):
+        """segments: (start_ms, end_ms, char_offset) per recognized segment, in transcript order."""
+        offsets = TranscriptIndex.for_text(text).offsets
+        return cls(
+            array('I', [start for start, _, _ in segments]),
+            array('I', [end for _, end, _ in segments]),
+            array('I', [char for _, _, char in segments]),
+            array('I', [bisect_left(offsets, char) for _, _, char in segments]),
+            len(text), len(offsets), text_digest(text),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load a timing file, or None if it's missing, unreadable or from another version."""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            magic, version, _, count, total_chars, total_words, text_hash = HEADER.unpack_from(data)
+        except (OSError, struct.error):
+            return None
+        if magic != TIMING_MAGIC or version != TIMING_VERSION or len(data) != HEADER.size + 16 * count:
+            return None
+
+        arrays = []
+        for i in range(4):
+            values = array('I')
+            start = HEADER.size + 4 * count * i
+            values.frombytes(data[start:start + 4 * count])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            arrays.append(values)
+        return cls(*arrays, total_chars, total_words, text_hash)
+
+    def save(self, path):
+        """Write the timing file (atomically, so the page never reads half of one)."""
+        parts = [HEADER.pack(TIMING_MAGIC, TIMING_VERSION, 0, len(self.starts),
+                             self.total_chars, self.total_words, self.text_hash)]
+        for values in (self.starts, self.ends, self.chars, self.words):
+            values = array('I', values)
+            if sys.byteorder == 'big':
+                values.byteswap()
+            parts.append(values.tobytes())
+
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(b''.join(parts))
+        os.replace(tmp, path)
+
+    def matches(self, text):
+        """True if this timing was made for exactly this transcript text."""
+        return self.text_hash == text_digest(text)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _segment_for(self, positions, position):
+        return max(0, bisect_right(positions, position) - 1)
+
+    def _time_within(self, i, positions, position, total):
+        end = positions[i + 1] if i + 1 < len(positions) else total
+        span = end - positions[i]
+        fraction = min(1.0, max(0.0, (position - positions[i]) / span)) if span else 0.0
+        return self.starts[i] + fraction * (self.ends[i] - self.starts[i])
+
+    def time_for_word(self, position):
+        """Estimated ms at which token `position` is spoken, or None without segments."""
+        if not self.starts:
+            return None
+        i = self._segment_for(self.words, position)
+        return self._time_within(i, self.words, position, self.total_words)
+
+    def time_for_char(self, offset):
+        """Estimated ms at which the text at character `offset` is spoken."""
+        if not self.starts:
+            return None
+        i = self._segment_for(self.chars, offset)
+        return self._time_within(i, self.chars, offset, self.total_chars)
+
+    def segment_at(self, ms):
+        """Index of the segment being spoken at ms (the one before, during a pause)."""
+        return self._segment_for(self.starts, ms)
+
+    def _position_at(self, ms, positions, total):
+        i = self.segment_at(ms)
+        end = positions[i + 1] if i + 1 < len(positions) else total
+        duration = self.ends[i] - self.starts[i]
+        fraction = min(1.0, max(0.0, (ms - self.starts[i]) / duration)) if duration else 0.0
+        return min(positions[i] + int(fraction * (end - positions[i])), max(positions[i], end - 1))
+
+    def word_at(self, ms):
+        """Token position being spoken at ms, or None without segments."""
+        return self._position_at(ms, self.words, self.total_words) if self.starts else None
+
+    def char_at(self, ms):
+        """Character offset of the text being spoken at ms, or None without segments."""
+        return self._position_at(ms, self.chars, self.total_chars) if self.starts else None
+
+    def segment_text(self, i, text):
+        end = self.chars[i + 1] if i + 1 < len(self.chars) else self.total_chars
+        return text[self.chars[i]:end].strip()
+
+
+def format_ms(ms):
+    seconds = int(ms // 1000)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+def parse_time(argument):
+    """'12:34' or '754.5' -> ms, or None if the argument isn't a time."""
+    match = TIME_ARGUMENT.match(argument)
+    if not match:
+        return None
+    minutes, seconds = match.groups()
+    return (int(minutes or 0) * 60 + float(seconds)) * 1000
+
+def find_phrase(index, phrase):
+    """Token position of the first occurrence of phrase, or None."""
+    words = tokenize(phrase)
+    if not words:
+        return None
+    for position in range(len(index.tokens) - len(words) + 1):
+        if index.tokens[position:position + len(words)] == words:
+            return position
+    return None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python transcript_timing.py <transcript_file> [phrase or time ...]")
+        print()
+        print("Example:")
+        print('  python transcript_timing.py episode-011-transcript.txt "blue wall" 12:30')
+        sys.exit(1)
+
+    transcript_file = sys.argv[1]
+    try:
+        with open(transcript_file, 'r', encoding='utf-8') as f:
+            text = f.read()
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    timing = TranscriptTiming.load(timing_path(transcript_file))
+    if timing is None:
+        print(f"Error: no timing for {transcript_file} (transcribe_audio.py writes {timing_path(transcript_file)})")
+        sys.exit(1)
+
+    size = os.path.getsize(timing_path(transcript_file))
+    print(f"Timing: {len(timing)} segments, {timing.total_words} words, "
+          f"{format_ms(timing.ends[-1]) if len(timing) else '0:00'} of audio, {size:,} bytes")
+    if not timing.matches(text):
+        print("Warning: the transcript changed since it was timed; positions may be off")
+
+    index = TranscriptIndex.for_text(text)
+    for argument in sys.argv[2:]:
+        ms = parse_time(argument)
+        if ms is not None:
+            segment = timing.segment_at(ms)
+            print(f"  {format_ms(ms)}  {timing.segment_text(segment, text)[:100]}")
+            continue
+        position = find_phrase(index, argument)
+        if position is None:
+            print(f"  \"{argument}\" not found")
+        else:
+            print(f"  \"{argument}\" at {format_ms(timing.time_for_word(position))}")